@@ -0,0 +1,233 @@
+"""
+Solves many puzzles of the same size in lockstep, as one stack of arrays.
+
+KurodokoBatch holds the numbers and shades of B puzzles as (B, height,
+width) arrays, and applies the direct rules to all of them at once with
+NumPy, so the cost of a pass is paid per batch rather than per puzzle:
+
+- deduce_cell_maxes_visible_space: a clue that sees exactly its number of
+  white-or-blank cells makes them all white
+- deduce_number_already_satisfied: a clue that already sees its number of
+  white cells makes the nearest blank cell in every direction black
+- black adjacency: blank neighbours of a black cell are made white
+
+Each pass also checks every puzzle for contradictions (adjacent black
+cells, black clues, clues that see too many or too few cells). Puzzles
+that hit a contradiction or stop changing are masked out of later passes,
+and connectivity is checked once they do. Puzzles the batch cannot finish
+are handed to the scalar Kurodoko solver.
+
+Usage:
+    python batch_kurodoko.py puzzles.txt --output solved.txt --batch-size 4096
+"""
+import argparse
+import itertools
+import time
+
+import numpy as np
+
+from budget import Budget
+from solve_kurodoko import Kurodoko, iter_kurodokos_from_file, make_line_from_kurodoko
+from visibility import runs_before, runs_after
+
+# (axis, reverse) of each of north, south, east and west, for (B, H, W) arrays.
+AXES = [(1, True), (1, False), (2, False), (2, True)]
+
+def visible_totals(shades, thresh):
+    """
+    Like VisibilityEngine.totals, for a stack of grids: the number of cells
+    each cell sees in all four directions, with the same thresh rules.
+    """
+    open_cells = shades >= thresh
+    totals = runs_before(open_cells, 1) + runs_after(open_cells, 1)
+    totals += runs_before(open_cells, 2) + runs_after(open_cells, 2)
+    totals[~open_cells] = 0
+    return totals
+
+def reached_from(sources, passable, axis, reverse):
+    """
+    For a stack of grids, marks the cells that can be reached by walking
+    along axis (towards its end, or its start if reverse) from a source
+    cell, passing only through passable cells on the way. Sources do not
+    reach themselves, and the cell reached need not be passable.
+    """
+    sources = np.moveaxis(sources, axis, 0)
+    passable = np.moveaxis(passable, axis, 0)
+    order = range(len(sources))
+    if reverse:
+        order = reversed(order)
+    reached = np.zeros_like(sources)
+    walking = np.zeros_like(sources[0])
+    for i in order:
+        reached[i] = walking
+        walking = sources[i] | (passable[i] & walking)
+    return np.moveaxis(reached, 0, axis)
+
+def reached_from_any_direction(sources, passable):
+    reached = np.zeros_like(sources)
+    for axis, reverse in AXES:
+        reached |= reached_from(sources, passable, axis, reverse)
+    return reached
+
+def neighbour_counts(cells):
+    """
+    Counts, for every cell of a stack of boolean grids, how many of its
+    orthogonal neighbours are set.
+    """
+    counts = np.zeros(cells.shape, dtype=np.int8)
+    counts[:, 1:, :] += cells[:, :-1, :]
+    counts[:, :-1, :] += cells[:, 1:, :]
+    counts[:, :, 1:] += cells[:, :, :-1]
+    counts[:, :, :-1] += cells[:, :, 1:]
+    return counts
+
+def open_cells_connected(open_cells):
+    """
+    Returns, per grid of the stack, whether its open cells form a single
+    region, by flood filling every grid at once from its first open cell.
+    """
+    batch_size = len(open_cells)
+    if batch_size == 0:
+        return np.zeros(0, dtype=bool)
+    flat = open_cells.reshape(batch_size, -1)
+    reached = np.zeros_like(flat)
+    reached[np.arange(batch_size), np.argmax(flat, axis=1)] = True
+    reached &= flat
+    reached = reached.reshape(open_cells.shape)
+    while True:
+        grown = reached | ((neighbour_counts(reached) > 0) & open_cells)
+        if np.array_equal(grown, reached):
+            break
+        reached = grown
+    return np.all((reached == open_cells).reshape(batch_size, -1), axis=1)
+
+class KurodokoBatch(object):
+    """
+    A stack of same-size puzzles. numbers and shades are (B, height, width)
+    arrays with the meanings they have in Kurodoko. After solve(),
+    statuses[i] is 1 if puzzle i was solved, -1 if it has a contradiction
+    and 0 if the direct rules got stuck on it.
+    """
+
+    def __init__(self, numbers, shades=None):
+        self.numbers = np.array(numbers, dtype=np.int16)
+        assert self.numbers.ndim == 3
+        if shades is None:
+            shades = np.where(self.numbers > 0, 1, 0)
+        self.shades = np.array(shades, dtype=np.int8)
+        assert self.shades.shape == self.numbers.shape
+        self.grid_size = self.numbers.shape[1:]
+        self.statuses = np.zeros(len(self.numbers), dtype=np.int8)
+        self.passes = 0
+
+    def __len__(self):
+        return len(self.numbers)
+
+    def apply_rules(self, numbers, shades):
+        """
+        One pass of the direct rules over a stack of grids, in place.
+        """
+        clues = numbers > 0
+        maxed = clues & (visible_totals(shades, 0) + 1 == numbers)
+        shades[reached_from_any_direction(maxed, shades >= 0) & (shades == 0)] = 1
+        satisfied = clues & (visible_totals(shades, 1) + 1 == numbers)
+        shades[reached_from_any_direction(satisfied, shades == 1) & (shades == 0)] = -1
+        shades[(neighbour_counts(shades == -1) > 0) & (shades == 0)] = 1
+
+    def contradictions(self, numbers, shades):
+        """
+        Flags the grids of a stack that break a rule other than
+        connectivity.
+        """
+        black = shades == -1
+        clues = numbers > 0
+        broken = (neighbour_counts(black) > 0) & black
+        broken |= clues & black
+        broken |= clues & (visible_totals(shades, 1) + 1 > numbers)
+        broken |= clues & (visible_totals(shades, 0) + 1 < numbers)
+        return np.any(broken, axis=(1, 2))
+
+    def solve(self, max_passes=1000):
+        """
+        Applies the rules until every puzzle is finished or stuck, and sets
+        self.statuses. Each pass only works on the puzzles still changing.
+        """
+        active = np.arange(len(self))
+        while len(active) > 0 and self.passes < max_passes:
+            numbers, shades = self.numbers[active], self.shades[active]
+            before = shades.copy()
+            self.apply_rules(numbers, shades)
+            self.shades[active] = shades
+            self.passes += 1
+            broken = self.contradictions(numbers, shades)
+            self.statuses[active[broken]] = -1
+            changed = np.any(shades != before, axis=(1, 2))
+            active = active[changed & ~broken]
+        settled = np.flatnonzero(self.statuses == 0)
+        connected = open_cells_connected(self.shades[settled] >= 0)
+        self.statuses[settled[~connected]] = -1
+        filled = np.all(self.shades[settled] != 0, axis=(1, 2))
+        self.statuses[settled[connected & filled]] = 1
+        return self.statuses
+
+    def kurodoko(self, i):
+        grid = Kurodoko(self.grid_size)
+        grid.numbers = self.numbers[i]
+        grid.shades = self.shades[i]
+        return grid
+
+def make_batch_from_kurodokos(grids):
+    return KurodokoBatch([grid.numbers for grid in grids], [grid.shades for grid in grids])
+
+def solve_kurodokos(grids, strategy="conjectures", batch_size=4096, seconds=None):
+    """
+    Solves a list of grids in place: grids of the same size are batched
+    through KurodokoBatch, and any the batch leaves unfinished are solved
+    with grid.solve(strategy), within seconds each if given. Returns the
+    statuses, in order, as grid.solve() would.
+    """
+    statuses = [None] * len(grids)
+    by_size = {}
+    for i, grid in enumerate(grids):
+        by_size.setdefault(grid.grid_size, []).append(i)
+    for indices in by_size.values():
+        for start in range(0, len(indices), batch_size):
+            chunk = indices[start:start + batch_size]
+            batch = make_batch_from_kurodokos([grids[i] for i in chunk])
+            batch.solve()
+            for i, shades, status in zip(chunk, batch.shades, batch.statuses.tolist()):
+                grids[i].shades = shades
+                if status == 0:
+                    budget = None if seconds is None else Budget(seconds=seconds)
+                    status = grids[i].solve(strategy, budget=budget)
+                statuses[i] = status
+    return statuses
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Solve a streaming-format file of Kurodoko puzzles in batches.")
+    parser.add_argument("puzzles", help="file with one puzzle per line")
+    parser.add_argument("--output", required=True, help="where to write the solved lines")
+    parser.add_argument("--strategy", default="conjectures",
+        choices=["deductions", "conjectures", "branched", "search", "sat"],
+        help="scalar solver for the puzzles the batch cannot finish")
+    parser.add_argument("--batch-size", type=int, default=4096)
+    parser.add_argument("--timeout", type=float, default=None, help="seconds per puzzle left to the scalar solver")
+    args = parser.parse_args(argv)
+
+    counts = {}
+    start = time.perf_counter()
+    grids = iter_kurodokos_from_file(args.puzzles)
+    with open(args.output, mode='w', buffering=1 << 20) as outfile:
+        while True:
+            chunk = list(itertools.islice(grids, args.batch_size))
+            if not chunk:
+                break
+            for grid, status in zip(chunk, solve_kurodokos(chunk, args.strategy, args.batch_size, args.timeout)):
+                outfile.write(make_line_from_kurodoko(grid, include_shades=True) + "\n")
+                counts[status] = counts.get(status, 0) + 1
+    print("Solved {0} puzzles in {1:.2f}s; statuses: {2}".format(
+        sum(counts.values()), time.perf_counter() - start, counts))
+    return counts
+
+if __name__ == "__main__":
+    main()
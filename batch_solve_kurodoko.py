@@ -0,0 +1,205 @@
+"""
+Solves many puzzle CSVs at once, spread over a pool of worker processes.
+
+Usage:
+    python batch_solve_kurodoko.py puzzles/ --output-dir solved/
+    python batch_solve_kurodoko.py "puzzles/*.csv" --workers 8 --strategy search
+    python batch_solve_kurodoko.py puzzles.txt --output solved.txt
+    python batch_solve_kurodoko.py puzzles.kdb --output solved.kdb
+
+A single file that is not a CSV is read in the one-puzzle-per-line
+streaming format (see make_kurodoko_from_line), or as a binary archive
+(see kurodoko_archive) if it ends in .kdb, and solved in bounded chunks,
+so corpora of any size run in constant memory.
+"""
+import argparse
+import glob
+import itertools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import numpy as np
+
+from budget import Budget
+from kurodoko_archive import ARCHIVE_EXTENSION, KurodokoArchive, write_archive
+from solve_kurodoko import (make_kurodoko_from_file, make_csv_from_kurodoko,
+    make_kurodoko_from_line, make_line_from_kurodoko)
+
+def find_puzzle_files(pattern):
+    """
+    Returns the sorted CSV paths in a directory, or matching a glob.
+    """
+    if os.path.isdir(pattern):
+        pattern = os.path.join(pattern, "*.csv")
+    return sorted(glob.glob(pattern))
+
+def solved_filepath(filepath, output_dir):
+    stem = os.path.splitext(os.path.basename(filepath))[0]
+    return os.path.join(output_dir, stem + "_solved.csv")
+
+def make_budget(seconds):
+    return None if seconds is None else Budget(seconds=seconds)
+
+def solve_puzzle_file(filepath, output_dir=None, strategy="branched", seconds=None):
+    """
+    Solves one puzzle, optionally writing the result to output_dir, and
+    returns a dict with its path, status (1/0/-1, or "timeout" if it took
+    longer than seconds), iterations, seconds and blank cells left.
+    """
+    start = time.perf_counter()
+    grid = make_kurodoko_from_file(filepath)
+    status = grid.solve(strategy, budget=make_budget(seconds))
+    if output_dir is not None:
+        make_csv_from_kurodoko(grid, solved_filepath(filepath, output_dir))
+    return {
+        'path': filepath,
+        'status': status,
+        'iterations': grid.solving_iterations,
+        'seconds': time.perf_counter() - start,
+        'blank_cells': len(grid.blank_cells()),
+    }
+
+def solve_puzzle_files(filepaths, output_dir=None, strategy="branched", workers=None, chunksize=None, seconds=None):
+    """
+    Solves the puzzles over a ProcessPoolExecutor with `workers` processes
+    (default: one per core). Puzzles are handed out in chunks to keep the
+    inter-process overhead low. Results come back in input order.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if chunksize is None:
+        chunksize = max(1, len(filepaths) // (4 * workers))
+    if output_dir is not None and not os.path.isdir(output_dir):
+        os.makedirs(output_dir)
+    solve_one = partial(solve_puzzle_file, output_dir=output_dir, strategy=strategy, seconds=seconds)
+    if workers == 1:
+        return [solve_one(filepath) for filepath in filepaths]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(solve_one, filepaths, chunksize=chunksize))
+
+def solve_puzzle_line(line, strategy="branched", seconds=None):
+    """
+    Solves one streaming-format line, and returns the solved line (with
+    shades) and the solve status.
+    """
+    grid = make_kurodoko_from_line(line)
+    status = grid.solve(strategy, budget=make_budget(seconds))
+    return make_line_from_kurodoko(grid, include_shades=True), status
+
+def map_in_batches(function, items, workers=None, chunksize=16):
+    """
+    Yields function(item) for every item, in order, computed over a
+    ProcessPoolExecutor. Items are pulled from the iterable and handed out
+    a batch at a time, so only one batch of items and results is ever held
+    in memory.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    items = iter(items)
+    if workers == 1:
+        for item in items:
+            yield function(item)
+        return
+    batch_size = 4 * workers * chunksize
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        while True:
+            batch = list(itertools.islice(items, batch_size))
+            if not batch:
+                break
+            for result in executor.map(function, batch, chunksize=chunksize):
+                yield result
+
+def solve_puzzle_stream(input_path, output_path, strategy="branched", workers=None, chunksize=16, seconds=None):
+    """
+    Solves every puzzle of a streaming-format file into output_path, in
+    input order, through map_in_batches. Returns a count of puzzles per
+    solve status.
+    """
+    statuses = {}
+    solve_one = partial(solve_puzzle_line, strategy=strategy, seconds=seconds)
+    with open(input_path) as infile, open(output_path, mode='w', buffering=1 << 20) as outfile:
+        lines = (line.strip() for line in infile)
+        lines = (line for line in lines if line and not line.startswith("#"))
+        for solved_line, status in map_in_batches(solve_one, lines, workers, chunksize):
+            outfile.write(solved_line + "\n")
+            statuses[status] = statuses.get(status, 0) + 1
+    return statuses
+
+def solve_archive_records(id_range, archive_path, strategy="branched", seconds=None):
+    """
+    Solves the puzzles with ids in range(*id_range) straight off the
+    mapped archive, and returns their (shades bytes, status). Workers are
+    sent only the ids, never the puzzles.
+    """
+    archive = KurodokoArchive(archive_path)
+    results = []
+    for i in range(*id_range):
+        grid = archive[i]
+        status = grid.solve(strategy, budget=make_budget(seconds))
+        results.append((grid.shades.tobytes(), status))
+    return results
+
+def solve_puzzle_archive(input_path, output_path, strategy="branched", workers=None, chunksize=16, seconds=None):
+    """
+    Solves every puzzle of an archive into a new archive holding the same
+    clues and the solved shades. Each task covers chunksize consecutive
+    ids. Returns a count of puzzles per solve status.
+    """
+    archive = KurodokoArchive(input_path)
+    statuses = {}
+    id_ranges = [(start, min(start + chunksize, len(archive))) for start in range(0, len(archive), chunksize)]
+    solve_range = partial(solve_archive_records, archive_path=input_path, strategy=strategy, seconds=seconds)
+
+    def solved_grids():
+        i = 0
+        for results in map_in_batches(solve_range, id_ranges, workers, chunksize=1):
+            for cells, status in results:
+                grid = archive[i]
+                grid.shades = np.frombuffer(cells, dtype=np.int8).reshape(archive.grid_size)
+                statuses[status] = statuses.get(status, 0) + 1
+                i += 1
+                yield grid
+
+    write_archive(solved_grids(), output_path, grid_size=archive.grid_size)
+    return statuses
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Solve a batch of Kurodoko puzzle CSVs.")
+    parser.add_argument("puzzles", help="directory of CSVs, or a glob pattern")
+    parser.add_argument("--output-dir", default=None, help="where to write solved grids")
+    parser.add_argument("--output", default=None, help="output file, for a streaming-format or archive input")
+    parser.add_argument("--strategy", default="branched",
+        choices=["deductions", "conjectures", "branched", "search", "sat"])
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--chunksize", type=int, default=None)
+    parser.add_argument("--timeout", type=float, default=None,
+        help="seconds per puzzle, after which it is reported as a timeout with its partial solution")
+    args = parser.parse_args(argv)
+
+    if os.path.isfile(args.puzzles) and not args.puzzles.endswith(".csv"):
+        if args.output is None:
+            parser.error("--output is required for a streaming-format or archive input")
+        if args.puzzles.endswith(ARCHIVE_EXTENSION):
+            solve_file = solve_puzzle_archive
+        else:
+            solve_file = solve_puzzle_stream
+        start = time.perf_counter()
+        statuses = solve_file(args.puzzles, args.output, args.strategy, args.workers, args.chunksize or 16, args.timeout)
+        print("Solved {0} puzzles in {1:.2f}s; statuses: {2}".format(
+            sum(statuses.values()), time.perf_counter() - start, statuses))
+        return statuses
+    filepaths = find_puzzle_files(args.puzzles)
+    start = time.perf_counter()
+    results = solve_puzzle_files(filepaths, args.output_dir, args.strategy, args.workers, args.chunksize, args.timeout)
+    elapsed = time.perf_counter() - start
+    for result in results:
+        print("{path}\t{status}\t{iterations}\t{seconds:.4f}".format(**result))
+    if results:
+        print("Solved {0} puzzles in {1:.2f}s ({2:.1f} puzzles/s)".format(
+            len(results), elapsed, len(results) / elapsed))
+    return results
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+"""
+Benchmarks the solvers on a fixed corpus of puzzles, and compares runs.
+
+Usage:
+    python benchmark_kurodoko.py run --output baseline.json
+    python benchmark_kurodoko.py run --output current.json --max-size 20
+    python benchmark_kurodoko.py compare baseline.json current.json --threshold 0.2
+
+The corpus holds example_grid.csv, the Wikipedia grid and puzzles generated
+from seeded random solutions, from 7x7 up to 45x45. Fewer clues make a
+puzzle harder, so each size comes in an "easy" and a "hard" variant.
+Generated puzzles are consistent (their source solution satisfies every
+clue) but not necessarily unique, which is fine for timing. The SAT
+backend (kurodoko_sat) is timed next to the native solvers on puzzles up
+to MAX_SAT_SIZE.
+
+compare exits with status 1 if any timing got slower by more than the
+threshold, so it can gate a CI job.
+"""
+import argparse
+import itertools
+import json
+import platform
+import random
+import sys
+import time
+
+import numpy as np
+
+from generate_kurodoko import random_solution, puzzle_from_solution
+from solve_kurodoko import Kurodoko, make_kurodoko_from_file
+
+WIKIPEDIA_NUMBERS = [
+    (0,2,9), (0,8,8), (1,8,7),
+    (2,4,12), (2,10,16), (3,0,9), (4,1,10),
+    (5,2,12), (5,4,8), (5,6,11), (5,8,3),
+    (6,9,3), (7,10,3), (8,0,7), (8,6,2),
+    (9,2,7), (10,2,2), (10,8,5),
+]
+
+# Share of the white cells that get a clue, per difficulty.
+CLUE_FRACTIONS = {'easy': 0.5, 'hard': 0.2}
+CORPUS_SIZES = [7, 10, 15, 20, 30, 40, 45]
+# Branched conjectures take minutes on the hard 15x15 and up, so they are
+# only timed on puzzles up to this size.
+MAX_BRANCHED_SIZE = 12
+# The pure Python SAT solver takes a few seconds on the hard 20x20 and
+# over a minute on the hard 40x40 and 45x45, so it is capped as well.
+MAX_SAT_SIZE = 20
+
+def make_corpus(max_size=None):
+    """
+    Returns the benchmark corpus as a list of (name, Kurodoko), generated
+    from fixed seeds so that every run sees the same puzzles.
+    """
+    corpus = [
+        ("example_grid", make_kurodoko_from_file("example_grid.csv")),
+        ("wikipedia", Kurodoko((11,11), set_numbers=WIKIPEDIA_NUMBERS)),
+    ]
+    for size in CORPUS_SIZES:
+        if max_size is not None and size > max_size:
+            continue
+        for difficulty in sorted(CLUE_FRACTIONS):
+            rng = random.Random("{0}x{0}-{1}".format(size, difficulty))
+            solution = random_solution((size, size), rng)
+            grid = puzzle_from_solution(solution, rng, CLUE_FRACTIONS[difficulty])
+            corpus.append(("{0}x{0}-{1}".format(size, difficulty), grid))
+    return corpus
+
+def time_call(function, repeat):
+    """
+    Returns (best seconds, result) over repeat calls of function.
+    """
+    best, result = None, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        seconds = time.perf_counter() - start
+        if best is None or seconds < best:
+            best = seconds
+    return best, result
+
+def benchmark_puzzle(name, grid, repeat=3):
+    """
+    Times each solver, and the hot helpers on the conjectures fixpoint, on
+    fresh clones of grid. Each _contains_contradiction timing includes the
+    assignment and rollback around it. Returns a list of result dicts.
+    """
+    results = []
+
+    def solver(method, **kwargs):
+        def run():
+            trial = grid.clone()
+            getattr(trial, method)(**kwargs)
+            return trial.solution_status(), trial.solving_iterations
+        return run
+
+    targets = [
+        ("deductions", solver("solve_grid_with_deductions")),
+        ("conjectures", solver("solve_grid_with_deductions_and_single_conjectures")),
+    ]
+    if max(grid.grid_size) <= MAX_BRANCHED_SIZE:
+        targets.append(("branched", solver("solve_grid_with_deductions_and_single_conjectures", branched=True)))
+    if max(grid.grid_size) <= MAX_SAT_SIZE:
+        targets.append(("sat", solver("solve", strategy="sat")))
+    for target, run in targets:
+        seconds, (outcome, iterations) = time_call(run, repeat)
+        results.append({
+            'puzzle': name, 'target': target, 'seconds': seconds,
+            'outcome': outcome, 'iterations': iterations,
+        })
+
+    fixpoint = grid.clone()
+    fixpoint.solve_grid_with_deductions_and_single_conjectures()
+    row, col = fixpoint.numbered_cells()[0]
+    # The contradiction check caches its answer until a cell changes, so
+    # each call follows a real assignment, as it does when probing. Blank
+    # cells are shaded black; on a solved fixpoint, white cells are.
+    probes = fixpoint.blank_cells() or [tuple(coord) for coord in np.argwhere(fixpoint.shades == 1)]
+    probe_cycle = itertools.cycle(probes)
+
+    def probe_contradiction():
+        fixpoint.checkpoint()
+        fixpoint.assign(next(probe_cycle), -1)
+        try:
+            return fixpoint._contains_contradiction()
+        finally:
+            fixpoint.rollback()
+
+    helpers = [
+        ("_contains_contradiction", probe_contradiction),
+        ("collect_contiguous_cells_from", lambda: fixpoint.collect_contiguous_cells_from(row, col, 0)),
+    ]
+    for target, run in helpers:
+        # Helpers are fast, so time batches of 100 calls.
+        seconds, _ = time_call(lambda: [run() for _ in range(100)], repeat)
+        results.append({'puzzle': name, 'target': target, 'seconds': seconds / 100})
+    return results
+
+def run_benchmarks(max_size=None, repeat=3, verbose=False):
+    results = []
+    for name, grid in make_corpus(max_size):
+        for result in benchmark_puzzle(name, grid, repeat):
+            if verbose:
+                print("{puzzle:<16} {target:<30} {seconds:.6f}".format(**result))
+            results.append(result)
+    return {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'repeat': repeat,
+        'results': results,
+    }
+
+def compare_results(baseline, current, threshold=0.2):
+    """
+    Matches results by (puzzle, target) and returns the list of
+    (puzzle, target, baseline seconds, current seconds) that got slower by
+    more than the threshold fraction.
+    """
+    baseline_seconds = dict([((result['puzzle'], result['target']), result['seconds']) for result in baseline['results']])
+    regressions = []
+    for result in current['results']:
+        key = (result['puzzle'], result['target'])
+        if key not in baseline_seconds:
+            continue
+        before, after = baseline_seconds[key], result['seconds']
+        if after > before * (1 + threshold):
+            regressions.append(key + (before, after))
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the Kurodoko solvers.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    run_parser = commands.add_parser("run", help="run the benchmarks")
+    run_parser.add_argument("--output", default=None, help="JSON file to write results to")
+    run_parser.add_argument("--max-size", type=int, default=None, help="skip generated puzzles above this size")
+    run_parser.add_argument("--repeat", type=int, default=3, help="keep the best of this many timings")
+    compare_parser = commands.add_parser("compare", help="flag regressions between two runs")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--threshold", type=float, default=0.2,
+        help="slowdown (as a fraction) counted as a regression")
+    args = parser.parse_args(argv)
+
+    if args.command == "run":
+        report = run_benchmarks(args.max_size, args.repeat, verbose=True)
+        if args.output is not None:
+            with open(args.output, mode='w') as jsonfile:
+                json.dump(report, jsonfile, indent=1)
+        return 0
+    with open(args.baseline) as jsonfile:
+        baseline = json.load(jsonfile)
+    with open(args.current) as jsonfile:
+        current = json.load(jsonfile)
+    regressions = compare_results(baseline, current, args.threshold)
+    for puzzle, target, before, after in regressions:
+        print("{0:<16} {1:<30} {2:.6f} -> {3:.6f} ({4:+.0%})".format(puzzle, target, before, after, after / before - 1))
+    print("{0} regression(s) beyond {1:.0%}".format(len(regressions), args.threshold))
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,131 @@
+"""
+Bitboard backend for the cached solving state of a Kurodoko grid.
+
+Each row (and, transposed, each column) is kept as a pair of integer
+bitmasks: one for black cells and one for white cells, with bit i standing
+for column i (or row i). Rows of up to 64 cells fit in a machine word; wider
+grids still work, as Python integers grow as needed.
+
+BitboardEngine answers the same queries as visibility.VisibilityEngine, but
+visibility runs and black adjacency come out of a few shifts and ANDs.
+"""
+import numpy as np
+
+from visibility import DIRECTIONS
+
+def row_mask(cells):
+    mask = 0
+    for i in np.flatnonzero(cells):
+        mask |= 1 << int(i)
+    return mask
+
+def trailing_ones(mask):
+    return (mask ^ (mask + 1)).bit_length() - 1
+
+def ones_below(mask, pos):
+    """
+    Counts the consecutive set bits directly below bit pos.
+    """
+    gaps = ~mask & ((1 << pos) - 1)
+    if gaps == 0:
+        return pos
+    return pos - gaps.bit_length()
+
+def popcount(mask):
+    return bin(mask).count('1')
+
+class BitboardEngine(object):
+
+    def __init__(self, shades):
+        self.rebuild(shades)
+
+    def rebuild(self, shades):
+        self.height, self.width = shades.shape
+        self.full_row = (1 << self.width) - 1
+        self.full_col = (1 << self.height) - 1
+        self.black_rows = [row_mask(shades[i, :] == -1) for i in range(self.height)]
+        self.white_rows = [row_mask(shades[i, :] == 1) for i in range(self.height)]
+        self.black_cols = [row_mask(shades[:, j] == -1) for j in range(self.width)]
+        self.white_cols = [row_mask(shades[:, j] == 1) for j in range(self.width)]
+
+    def copy(self):
+        other = BitboardEngine.__new__(BitboardEngine)
+        other.height, other.width = self.height, self.width
+        other.full_row, other.full_col = self.full_row, self.full_col
+        other.black_rows = list(self.black_rows)
+        other.white_rows = list(self.white_rows)
+        other.black_cols = list(self.black_cols)
+        other.white_cols = list(self.white_cols)
+        return other
+
+    def update(self, shades, row, col, old_shade=None):
+        row, col = int(row), int(col)
+        shade = shades[row, col]
+        row_bit = 1 << col
+        col_bit = 1 << row
+        self.black_rows[row] &= ~row_bit
+        self.white_rows[row] &= ~row_bit
+        self.black_cols[col] &= ~col_bit
+        self.white_cols[col] &= ~col_bit
+        if shade == -1:
+            self.black_rows[row] |= row_bit
+            self.black_cols[col] |= col_bit
+        elif shade == 1:
+            self.white_rows[row] |= row_bit
+            self.white_cols[col] |= col_bit
+
+    def _open_row(self, row, thresh):
+        if thresh == 1:
+            return self.white_rows[row]
+        return self.full_row & ~self.black_rows[row]
+
+    def _open_col(self, col, thresh):
+        if thresh == 1:
+            return self.white_cols[col]
+        return self.full_col & ~self.black_cols[col]
+
+    def count(self, row, col, direction, thresh):
+        row, col = int(row), int(col)
+        if direction in ['east', 'west']:
+            line, pos = self._open_row(row, thresh), col
+        else:
+            line, pos = self._open_col(col, thresh), row
+        if not (line >> pos) & 1:
+            return 0
+        if direction in ['east', 'south']:
+            return trailing_ones(line >> (pos + 1))
+        return ones_below(line, pos)
+
+    def total(self, row, col, thresh):
+        return sum([self.count(row, col, direction, thresh) for direction in DIRECTIONS])
+
+    @property
+    def runs(self):
+        runs = np.zeros((2, 4, self.height, self.width), dtype=np.int16)
+        for thresh in [0, 1]:
+            for d, direction in enumerate(DIRECTIONS):
+                for row in range(self.height):
+                    for col in range(self.width):
+                        runs[thresh, d, row, col] = self.count(row, col, direction, thresh)
+        return runs
+
+    @property
+    def totals(self):
+        return self.runs.sum(axis=1, dtype=np.int16)
+
+    def black_neighbours(self, shades, row, col):
+        row, col = int(row), int(col)
+        black_rows = self.black_rows
+        count = (black_rows[row] >> col >> 1) & 1
+        if col > 0:
+            count += (black_rows[row] >> (col - 1)) & 1
+        if row > 0:
+            count += (black_rows[row - 1] >> col) & 1
+        if row < self.height - 1:
+            count += (black_rows[row + 1] >> col) & 1
+        return count
+
+    def adjacent_black_pairs(self, shades):
+        pairs = sum([popcount(mask & (mask >> 1)) for mask in self.black_rows])
+        pairs += sum([popcount(upper & lower) for upper, lower in zip(self.black_rows, self.black_rows[1:])])
+        return pairs
@@ -0,0 +1,87 @@
+"""
+Time and work budgets for anytime solving.
+
+A Budget is attached to a grid for the length of a solve (see
+Kurodoko.solve(budget=...)). The solver loops charge it cooperatively:
+
+- a probe is one tentative assignment checked for a contradiction (the
+  single and branched conjectures are made of these)
+- a node is one node of the backtracking search, or one decision of the
+  CDCL solver
+- the deadline is checked at every charge, and between the cells of a
+  deduction pass
+
+Once any limit is passed, the charge raises BudgetExceeded. It unwinds
+through the solver's checkpoint/rollback blocks, so every tentative
+assignment is undone and the grid is left holding only deductions, which
+are sound. The solve then returns TIMEOUT.
+"""
+import time
+
+TIMEOUT = "timeout"
+
+class BudgetExceeded(Exception):
+    pass
+
+class Budget(object):
+    """
+    Limits a solve to `seconds` of wall-clock time from start(), an
+    absolute time.monotonic() `deadline`, `max_nodes` nodes and/or
+    `max_probes` probes. Any limit left as None is not enforced.
+
+    After a solve, nodes, probes, elapsed and exceeded (None, or which of
+    "deadline", "nodes" and "probes" ran out) describe the work done.
+    """
+
+    def __init__(self, seconds=None, max_nodes=None, max_probes=None, deadline=None):
+        self.seconds = seconds
+        self.max_nodes = max_nodes
+        self.max_probes = max_probes
+        self.fixed_deadline = deadline
+        self.deadline = deadline
+        self.started = None
+        self.elapsed = 0.0
+        self.nodes = 0
+        self.probes = 0
+        self.exceeded = None
+
+    def start(self):
+        self.started = time.monotonic()
+        self.deadline = self.fixed_deadline
+        if self.seconds is not None:
+            relative = self.started + self.seconds
+            self.deadline = relative if self.deadline is None else min(self.deadline, relative)
+        self.nodes = 0
+        self.probes = 0
+        self.exceeded = None
+
+    def stop(self):
+        self.elapsed = time.monotonic() - self.started
+
+    def exceed(self, limit):
+        self.exceeded = limit
+        raise BudgetExceeded(limit)
+
+    def check(self):
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            self.exceed("deadline")
+
+    def spend_node(self):
+        self.nodes += 1
+        if self.max_nodes is not None and self.nodes > self.max_nodes:
+            self.exceed("nodes")
+        self.check()
+
+    def spend_probe(self):
+        self.probes += 1
+        if self.max_probes is not None and self.probes > self.max_probes:
+            self.exceed("probes")
+        self.check()
+
+    def report(self):
+        return {
+            'elapsed': self.elapsed,
+            'nodes': self.nodes,
+            'probes': self.probes,
+            'exceeded': self.exceeded,
+        }
@@ -0,0 +1,58 @@
+"""
+Split tables for the clue rule Kurodoko.deduce_clue_splits.
+
+A clue N sees N-1 cells, split between its four rays as counts
+(k_north, k_south, k_east, k_west). For each ray, the board decides which
+counts are still possible: seeing k cells needs the first k cells of the
+ray to be open, and cell k (if any) to be a black stopper. Writing those
+possibilities as one bitmask per ray (bit k set if count k is possible),
+achievable_counts() returns, for every ray, the counts that appear in at
+least one split adding up to N-1.
+
+Since the bitmasks also encode the ray lengths, the same tables come up
+again and again while solving, and are memoized.
+"""
+from functools import lru_cache
+
+def add_counts(sums, counts):
+    """
+    Bitmask of every a + k with bit a of sums and bit k of counts set.
+    """
+    result = 0
+    k = 0
+    while counts >> k:
+        if (counts >> k) & 1:
+            result |= sums << k
+        k += 1
+    return result
+
+@lru_cache(maxsize=None)
+def achievable_counts(total, masks):
+    """
+    Given the possible counts of each ray as bitmasks, returns a tuple of
+    bitmasks of the counts each ray takes in some split adding up to total.
+    All zero if there is no such split.
+    """
+    prefix = [1]
+    for counts in masks:
+        prefix.append(add_counts(prefix[-1], counts))
+    if not (prefix[-1] >> total) & 1:
+        return (0,) * len(masks)
+    suffix = [1]
+    for counts in reversed(masks):
+        suffix.append(add_counts(suffix[-1], counts))
+    suffix.reverse()
+    achievable = []
+    for d, counts in enumerate(masks):
+        others = add_counts(prefix[d], suffix[d + 1])
+        mask = 0
+        k = 0
+        while counts >> k and k <= total:
+            if (counts >> k) & 1 and (others >> (total - k)) & 1:
+                mask |= 1 << k
+            k += 1
+        achievable.append(mask)
+    return tuple(achievable)
+
+def lowest_count(mask):
+    return (mask & -mask).bit_length() - 1
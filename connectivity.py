@@ -0,0 +1,247 @@
+"""
+Connectivity of the open (white or blank) cells of a Kurodoko grid.
+
+Cells are addressed by their flat index row * width + col.
+"""
+from collections import deque
+
+from topology import get_topology, grid_neighbours
+
+def reachable_cells(open_cells, start):
+    """
+    Breadth-first search from the flat index start through open cells.
+    Returns the flat indices reached, including start itself.
+    """
+    neighbour_indices = get_topology(open_cells.shape).neighbour_indices
+    is_open = open_cells.ravel().tolist()
+    visited = bytearray(len(is_open))
+    visited[start] = 1
+    reached = [start]
+    queue = deque([start])
+    while queue:
+        cell = queue.popleft()
+        for neighbour in neighbour_indices[cell]:
+            if is_open[neighbour] and not visited[neighbour]:
+                visited[neighbour] = 1
+                reached.append(neighbour)
+                queue.append(neighbour)
+    return reached
+
+def label_components(open_cells):
+    """
+    Labels the components of the open cells in linear time.
+
+    Returns (labels, n_components), where labels is a flat list holding the
+    component number of each open cell and -1 for every closed cell.
+    """
+    neighbour_indices = get_topology(open_cells.shape).neighbour_indices
+    is_open = open_cells.ravel().tolist()
+    labels = [-1] * len(is_open)
+    n_components = 0
+    for root in range(len(is_open)):
+        if not is_open[root] or labels[root] != -1:
+            continue
+        labels[root] = n_components
+        queue = deque([root])
+        while queue:
+            cell = queue.popleft()
+            for neighbour in neighbour_indices[cell]:
+                if is_open[neighbour] and labels[neighbour] == -1:
+                    labels[neighbour] = n_components
+                    queue.append(neighbour)
+        n_components += 1
+    return labels, n_components
+
+class CutAnalysis(object):
+    """
+    Components and articulation points of the graph of open cells, found
+    with a single iterative Tarjan depth-first search.
+
+    An articulation point is an open cell whose removal splits its component
+    into two or more pieces. Together with the component count this answers
+    "would blackening this cell cut off a region?" for every cell at once.
+    """
+
+    def __init__(self, open_cells):
+        neighbour_indices = get_topology(open_cells.shape).neighbour_indices
+        is_open = open_cells.ravel().tolist()
+        n_cells = len(is_open)
+        discovered = [-1] * n_cells
+        low = [0] * n_cells
+        self.component_of = [-1] * n_cells
+        self.component_sizes = []
+        self.articulation_points = set()
+        timer = 0
+        for root in range(n_cells):
+            if not is_open[root] or discovered[root] != -1:
+                continue
+            component = len(self.component_sizes)
+            self.component_sizes.append(1)
+            self.component_of[root] = component
+            discovered[root] = low[root] = timer
+            timer += 1
+            root_children = 0
+            stack = [(root, -1, iter(neighbour_indices[root]))]
+            while stack:
+                cell, parent, pending = stack[-1]
+                descended = False
+                for neighbour in pending:
+                    if not is_open[neighbour]:
+                        continue
+                    if discovered[neighbour] == -1:
+                        discovered[neighbour] = low[neighbour] = timer
+                        timer += 1
+                        self.component_of[neighbour] = component
+                        self.component_sizes[component] += 1
+                        stack.append((neighbour, cell, iter(neighbour_indices[neighbour])))
+                        descended = True
+                        break
+                    elif neighbour != parent:
+                        low[cell] = min(low[cell], discovered[neighbour])
+                if descended:
+                    continue
+                stack.pop()
+                if parent == -1:
+                    continue
+                low[parent] = min(low[parent], low[cell])
+                if parent == root:
+                    root_children += 1
+                elif low[cell] >= discovered[parent]:
+                    self.articulation_points.add(parent)
+            if root_children > 1:
+                self.articulation_points.add(root)
+
+    @property
+    def n_components(self):
+        return len(self.component_sizes)
+
+    def removal_disconnects(self, idx):
+        """
+        Returns True if the open cells left after closing idx would form
+        more than one component. idx must currently be open.
+        """
+        component = self.component_of[idx]
+        assert component != -1
+        if self.component_sizes[component] == 1:
+            # The cell is a component of its own; closing it removes one.
+            return self.n_components - 1 > 1
+        return self.n_components > 1 or idx in self.articulation_points
+
+class SpanningTree(object):
+    """
+    A spanning tree of the open cells, kept as a certificate that they are
+    connected while cells close (turn black) and reopen.
+
+    Closing a leaf of the tree leaves a spanning tree of the remaining open
+    cells, and a reopened cell next to the tree can hang off it as a new
+    leaf, so in those cases the certificate stays valid at no cost. When a
+    cell inside the tree closes, each of its children is re-hung from
+    another neighbour still connected to the root; only if that fails (or
+    an isolated cell reopens) is the certificate dropped, and the next
+    build() flood fills again. Breadth-first trees are used, since they are
+    shallow and have many leaves.
+
+    While valid is False, nothing is known; build() sets valid to whether
+    the open cells are connected.
+    """
+
+    def __init__(self, topology):
+        self.neighbour_indices = topology.neighbour_indices
+        self.n_cells = topology.n_cells
+        self.parent = [-1] * self.n_cells
+        self.n_children = [0] * self.n_cells
+        self.in_tree = bytearray(self.n_cells)
+        self.root = -1
+        self.valid = False
+        self.builds = 0
+
+    def copy(self):
+        other = SpanningTree.__new__(SpanningTree)
+        other.neighbour_indices = self.neighbour_indices
+        other.n_cells = self.n_cells
+        other.parent = list(self.parent)
+        other.n_children = list(self.n_children)
+        other.in_tree = bytearray(self.in_tree)
+        other.root = self.root
+        other.valid = self.valid
+        other.builds = self.builds
+        return other
+
+    def build(self, open_cells):
+        """
+        Grows a breadth-first tree from the first open cell, and returns
+        whether it reached every open cell.
+        """
+        self.builds += 1
+        is_open = open_cells.ravel().tolist()
+        parent = self.parent = [-1] * self.n_cells
+        n_children = self.n_children = [0] * self.n_cells
+        in_tree = self.in_tree = bytearray(self.n_cells)
+        self.root = is_open.index(True) if True in is_open else -1
+        reached = 0
+        if self.root != -1:
+            in_tree[self.root] = 1
+            reached = 1
+            queue = deque([self.root])
+            while queue:
+                cell = queue.popleft()
+                for neighbour in self.neighbour_indices[cell]:
+                    if is_open[neighbour] and not in_tree[neighbour]:
+                        in_tree[neighbour] = 1
+                        parent[neighbour] = cell
+                        n_children[cell] += 1
+                        reached += 1
+                        queue.append(neighbour)
+        self.valid = reached == sum(is_open)
+        return self.valid
+
+    def close(self, idx):
+        if not self.valid:
+            return
+        children = [neighbour for neighbour in self.neighbour_indices[idx]
+                    if self.in_tree[neighbour] and self.parent[neighbour] == idx]
+        self.in_tree[idx] = 0
+        if idx == self.root:
+            self.root = children.pop(0) if children else -1
+            if self.root != -1:
+                self.parent[self.root] = -1
+        else:
+            self.n_children[self.parent[idx]] -= 1
+        self.parent[idx] = -1
+        self.n_children[idx] = 0
+        for child in children:
+            if not self._reattach(child, idx):
+                self.valid = False
+                return
+
+    def _reattach(self, child, removed):
+        """
+        Hangs child (and its subtree) off another neighbour whose path to
+        the root avoids the removed cell, if it has one.
+        """
+        for neighbour in self.neighbour_indices[child]:
+            if not self.in_tree[neighbour]:
+                continue
+            node = neighbour
+            while node != -1 and node != removed and node != child:
+                node = self.parent[node]
+            if node == -1:
+                self.parent[child] = neighbour
+                self.n_children[neighbour] += 1
+                return True
+        return False
+
+    def reopen(self, idx):
+        if not self.valid:
+            return
+        if self.root == -1:
+            self.root = idx
+            self.in_tree[idx] = 1
+            return
+        for neighbour in self.neighbour_indices[idx]:
+            if self.in_tree[neighbour]:
+                self.parent[idx] = neighbour
+                self.n_children[neighbour] += 1
+                self.in_tree[idx] = 1
+                return
+        self.valid = False
@@ -0,0 +1,172 @@
+"""
+Grades puzzles by the hardest kind of reasoning needed to solve them.
+
+The solver runs in layers, from cheapest to most expensive:
+
+0. "deductions": the direct deductions (solve_grid_with_deductions)
+1. "single_conjectures": check_must_not_be_black/check_must_not_be_white
+2. "branched_conjectures": make_branched_conjecture-style case splits
+3. "search": backtracking search over whatever is left
+
+A layer only runs when every cheaper one is stuck, and as soon as it
+decides something, grading drops back to the cheapest layer. All layers
+work on the same grid, so nothing is re-derived when moving between them.
+
+Usage:
+    python grade_kurodoko.py puzzles/ --workers 8
+"""
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from batch_solve_kurodoko import find_puzzle_files
+from solve_kurodoko import get_x_y_outcomes, interpret_x_y_outcomes, make_kurodoko_from_file
+
+LAYERS = ["deductions", "single_conjectures", "branched_conjectures", "search"]
+
+class Grade(object):
+    """
+    The result of grading one puzzle:
+    - status: "unique", "multiple" (more than one solution) or "unsolvable"
+    - highest_layer: index into LAYERS of the hardest layer that was needed
+    - uses: for each layer, how often it decided something (cells decided
+      for deductions, successful probes or case splits for conjectures,
+      and nodes explored for search)
+    """
+
+    def __init__(self):
+        self.status = None
+        self.highest_layer = 0
+        self.uses = dict([(layer, 0) for layer in LAYERS])
+
+    @property
+    def layer_name(self):
+        return LAYERS[self.highest_layer]
+
+    def sort_key(self):
+        """
+        Orders puzzles from easiest to hardest: by the hardest layer needed,
+        then by how often it was needed.
+        """
+        return (self.highest_layer, self.uses[self.layer_name])
+
+    def record(self, layer, uses):
+        self.uses[layer] += uses
+        self.highest_layer = max(self.highest_layer, LAYERS.index(layer))
+
+    def as_dict(self):
+        return {'status': self.status, 'layer': self.layer_name, 'uses': dict(self.uses)}
+
+def apply_deductions(grid):
+    n_blank = len(grid.blank_cells())
+    grid.solve_grid_with_deductions()
+    return n_blank - len(grid.blank_cells())
+
+def apply_single_conjectures(grid):
+    """
+    One sweep of the single-conjecture probes of
+    solve_grid_with_deductions_and_single_conjectures. Returns the number
+    of cells decided, or None on a contradiction.
+    """
+    decided = 0
+    for coord in grid.get_cant_be_black_candidates():
+        if grid.shades[coord] == 0 and grid.check_must_not_be_black(*coord):
+            grid.assign(coord, 1)
+            decided += 1
+    for coord in grid.get_cant_be_white_candidates():
+        if grid.shades[coord] == 0 and grid.check_must_not_be_white(*coord):
+            if -1 in grid.neighbouring_shades(*coord):
+                return None
+            grid.set_shade_black(*coord)
+            decided += 1
+    return decided
+
+def apply_branched_conjecture(grid):
+    """
+    Looks for one case split that decides a cell and applies it. Returns 1
+    if it found one, 0 if not, and None if a split shows there is no
+    solution.
+    """
+    candidates = grid.get_cant_be_black_candidates() + grid.get_cant_be_white_candidates()
+    for coord in candidates:
+        if grid.shades[coord] != 0:
+            continue
+        action, cell_value = interpret_x_y_outcomes(*get_x_y_outcomes(grid, coord))
+        if action == "make_clear_deduction":
+            grid.assign(coord, cell_value)
+            return 1
+        elif action == "unsolvable_grid":
+            return None
+    return 0
+
+def grade(grid):
+    """
+    Solves grid layer by layer and returns its Grade. The grid is left
+    solved (if it can be).
+    """
+    result = Grade()
+    while True:
+        result.record("deductions", apply_deductions(grid))
+        if grid._contains_contradiction():
+            result.status = "unsolvable"
+            return result
+        if grid._is_filled_out():
+            result.status = "unique"
+            return result
+        decided = apply_single_conjectures(grid)
+        if decided:
+            result.record("single_conjectures", decided)
+            continue
+        if decided is None or grid._contains_contradiction():
+            result.status = "unsolvable"
+            return result
+        decided = apply_branched_conjecture(grid)
+        if decided:
+            result.record("branched_conjectures", decided)
+            continue
+        if decided is None:
+            result.status = "unsolvable"
+            return result
+        break
+    count, solutions = grid.count_solutions(limit=2)
+    result.record("search", grid.search_nodes)
+    if count == 1:
+        grid.adopt_shades(solutions[0])
+    result.status = ["unsolvable", "unique", "multiple"][count]
+    return result
+
+def grade_puzzle_file(filepath):
+    result = grade(make_kurodoko_from_file(filepath)).as_dict()
+    result['path'] = filepath
+    return result
+
+def grade_puzzle_files(filepaths, workers=None, chunksize=None):
+    """
+    Grades the puzzles over a ProcessPoolExecutor, like
+    batch_solve_kurodoko.solve_puzzle_files. Results come back in input
+    order, as dicts.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if chunksize is None:
+        chunksize = max(1, len(filepaths) // (4 * workers))
+    if workers == 1:
+        return [grade_puzzle_file(filepath) for filepath in filepaths]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(grade_puzzle_file, filepaths, chunksize=chunksize))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Grade the difficulty of Kurodoko puzzle CSVs.")
+    parser.add_argument("puzzles", help="directory of CSVs, or a glob pattern")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--chunksize", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    results = grade_puzzle_files(find_puzzle_files(args.puzzles), args.workers, args.chunksize)
+    for result in results:
+        uses = " ".join(["{0}={1}".format(layer, result['uses'][layer]) for layer in LAYERS])
+        print("{0}\t{1}\t{2}\t{3}".format(result['path'], result['status'], result['layer'], uses))
+    return results
+
+if __name__ == "__main__":
+    main()
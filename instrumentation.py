@@ -0,0 +1,126 @@
+"""
+Per-rule counters and timings for the solver.
+
+Instrumentation lives in a subclass, built by make_instrumented_class(),
+whose listed methods are wrapped to record into a SolverStats. A grid is
+only switched to that class for the duration of a profiled solve (see
+Kurodoko.solve(profile=True)), so unprofiled solves run the plain methods
+and pay nothing.
+"""
+import json
+import time
+
+import numpy as np
+
+class SolverStats(object):
+    """
+    For each instrumented method name: the number of calls, cumulative
+    seconds (including time spent in nested instrumented calls) and the
+    number of cells it decided. total_seconds holds the duration of the
+    whole solve.
+    """
+
+    def __init__(self):
+        self.calls = {}
+        self.seconds = {}
+        self.cells_decided = {}
+        self.total_seconds = 0.0
+
+    def record(self, name, seconds, cells_decided=0):
+        self.calls[name] = self.calls.get(name, 0) + 1
+        self.seconds[name] = self.seconds.get(name, 0.0) + seconds
+        self.cells_decided[name] = self.cells_decided.get(name, 0) + cells_decided
+
+    def records(self, **labels):
+        """
+        One dict per method, sorted by name, each extended with labels.
+        """
+        records = []
+        for name in sorted(self.calls):
+            record = dict(labels)
+            record.update({
+                'name': name,
+                'calls': self.calls[name],
+                'seconds': self.seconds[name],
+                'cells_decided': self.cells_decided[name],
+            })
+            records.append(record)
+        return records
+
+    def write_json_lines(self, textfile, **labels):
+        """
+        Writes records(**labels) to an open text file, one JSON object per
+        line, followed by a 'total' line with the duration of the solve.
+        """
+        total = dict(labels, name='total', seconds=self.total_seconds)
+        for record in self.records(**labels) + [total]:
+            textfile.write(json.dumps(record) + "\n")
+
+    def report(self):
+        lines = ["{0:<50} {1:>8} {2:>10} {3:>8}".format("method", "calls", "seconds", "decided")]
+        for name in sorted(self.calls, key=lambda name: -self.seconds[name]):
+            lines.append("{0:<50} {1:>8} {2:>10.4f} {3:>8}".format(
+                name, self.calls[name], self.seconds[name], self.cells_decided[name]))
+        lines.append("{0:<50} {1:>8} {2:>10.4f}".format("total", "", self.total_seconds))
+        return "\n".join(lines)
+
+def count_blank_cells(grid):
+    return int(np.count_nonzero(grid._cells == 0))
+
+def wrap_rule(name, method):
+    """
+    Records calls to a deduction rule, crediting it with the cells that
+    stop being blank while it runs. A rule called while a checkpoint is
+    open (inside a probe or hypothesis) is credited with none, since its
+    cells are rolled back afterwards.
+    """
+    def instrumented(self, *args, **kwargs):
+        tentative = bool(self._trail_marks)
+        blank_cells = 0 if tentative else count_blank_cells(self)
+        start = time.perf_counter()
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            seconds = time.perf_counter() - start
+            self.stats.record(name, seconds, 0 if tentative else blank_cells - count_blank_cells(self))
+    return instrumented
+
+def wrap_probe(name, method):
+    """
+    Records calls to a check_must_not_* probe. Probes roll their changes
+    back, so one cell is credited each time the probe succeeds, since the
+    solver then decides that cell, unless it runs under an open checkpoint
+    as wrap_rule() describes. A probe that raises is still recorded, with
+    no cells.
+    """
+    def instrumented(self, *args, **kwargs):
+        tentative = bool(self._trail_marks)
+        start = time.perf_counter()
+        result = None
+        try:
+            result = method(self, *args, **kwargs)
+            return result
+        finally:
+            self.stats.record(name, time.perf_counter() - start, 0 if tentative else int(bool(result)))
+    return instrumented
+
+def wrap_helper(name, method):
+    def instrumented(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            self.stats.record(name, time.perf_counter() - start)
+    return instrumented
+
+def make_instrumented_class(base, rules=(), probes=(), helpers=()):
+    """
+    Returns a subclass of base with the named methods wrapped. It adds no
+    slots, so a base instance can switch to it by assigning __class__; it
+    must then have a SolverStats in its stats attribute.
+    """
+    namespace = {'__slots__': (), '__module__': base.__module__}
+    for names, wrap in [(rules, wrap_rule), (probes, wrap_probe), (helpers, wrap_helper)]:
+        for name in names:
+            namespace[name] = wrap(name, getattr(base, name))
+    return type('Instrumented' + base.__name__, (base,), namespace)
@@ -0,0 +1,219 @@
+"""
+A compact binary archive of puzzles (and their shades), for corpora too
+large to keep as CSVs or text lines.
+
+Layout, all little-endian:
+- a 32-byte header (HEADER_DTYPE): magic, version, grid dimensions, the
+  size of one record, the number of records and where the index starts
+- fixed-width records, one per puzzle: the clues as int8 (0 for no clue),
+  then the shades packed four cells to a byte, two bits per cell, as
+  shade + 1
+- the index: the byte offset of every record, as uint64
+
+Every puzzle in an archive has the same grid size. KurodokoArchive maps
+the file with numpy.memmap, so opening it reads only the header, and
+loading a puzzle by id touches only its record.
+
+Usage:
+    python kurodoko_archive.py pack puzzles.txt puzzles.kdb
+    python kurodoko_archive.py pack "puzzles/*.csv" puzzles.kdb
+    python kurodoko_archive.py unpack puzzles.kdb puzzles.txt
+    python kurodoko_archive.py info puzzles.kdb
+"""
+import argparse
+import itertools
+import os
+
+import numpy as np
+
+from solve_kurodoko import (Kurodoko, make_kurodoko_from_file, iter_kurodokos_from_file,
+    write_kurodokos_to_file)
+
+MAGIC = b"KDKA"
+VERSION = 1
+ARCHIVE_EXTENSION = ".kdb"
+HEADER_DTYPE = np.dtype([
+    ('magic', 'S4'), ('version', '<u2'), ('height', '<u2'), ('width', '<u2'), ('reserved', '<u2'),
+    ('record_size', '<u4'), ('count', '<u8'), ('index_offset', '<u8'),
+])
+HEADER_SIZE = HEADER_DTYPE.itemsize
+# Clues are stored as int8, which caps them at 127; a clue is at most
+# height + width - 1.
+MAX_CLUE = 127
+
+def record_dtype(grid_size):
+    n_cells = grid_size[0] * grid_size[1]
+    return np.dtype([('clues', 'i1', (n_cells,)), ('shades', 'u1', ((n_cells + 3) // 4,))])
+
+def pack_shades(shades):
+    """
+    Packs shades (-1, 0 or 1 per cell) two bits per cell, four cells to a
+    byte, first cell in the lowest bits.
+    """
+    values = np.asarray(shades, dtype=np.int8).reshape(-1) + 1
+    padded = np.zeros(4 * ((len(values) + 3) // 4), dtype=np.uint8)
+    padded[:len(values)] = values
+    quads = padded.reshape(-1, 4)
+    return quads[:, 0] | (quads[:, 1] << 2) | (quads[:, 2] << 4) | (quads[:, 3] << 6)
+
+def unpack_shades(packed, n_cells):
+    """
+    The inverse of pack_shades, as a flat int8 array of n_cells shades.
+    """
+    values = (np.asarray(packed, dtype=np.uint8)[:, None] >> np.array([0, 2, 4, 6], dtype=np.uint8)) & 3
+    return values.reshape(-1)[:n_cells].astype(np.int8) - 1
+
+def write_archive(grids, filepath, grid_size=None, buffer_size=1 << 20):
+    """
+    Writes an iterable of grids as an archive. grids is consumed lazily, so
+    it can be a generator of any length. The grid size is taken from the
+    first grid unless given, and every grid must share it. Returns the
+    number of grids written.
+    """
+    grids = iter(grids)
+    first = next(grids, None)
+    if first is not None:
+        grids = itertools.chain([first], grids)
+        if grid_size is None:
+            grid_size = first.grid_size
+    if grid_size is None:
+        raise ValueError("grid_size is needed to write an empty archive")
+    grid_size = tuple(grid_size)
+    if sum(grid_size) - 1 > MAX_CLUE:
+        raise ValueError("Clues of a {0}x{1} grid do not fit in int8".format(*grid_size))
+    dtype = record_dtype(grid_size)
+    record = np.zeros(1, dtype=dtype)
+    count = 0
+    with open(filepath, mode='wb', buffering=buffer_size) as archive:
+        # The header is filled in last, once the count is known.
+        archive.write(bytes(HEADER_SIZE))
+        for grid in grids:
+            if grid.grid_size != grid_size:
+                raise ValueError("Grid {0} is {1}, not {2}".format(count, grid.grid_size, grid_size))
+            record['clues'] = grid.numbers.reshape(-1)
+            record['shades'] = pack_shades(grid.shades)
+            archive.write(record.tobytes())
+            count += 1
+        index_offset = HEADER_SIZE + count * dtype.itemsize
+        offsets = HEADER_SIZE + np.arange(count, dtype='<u8') * dtype.itemsize
+        archive.write(offsets.tobytes())
+        header = np.zeros(1, dtype=HEADER_DTYPE)
+        header[0] = (MAGIC, VERSION, grid_size[0], grid_size[1], 0, dtype.itemsize, count, index_offset)
+        archive.seek(0)
+        archive.write(header.tobytes())
+    return count
+
+class KurodokoArchive(object):
+    """
+    Read-only, random access to the puzzles of an archive file:
+    archive[i] builds the Kurodoko of record i, and iterating yields them
+    all in order. numbers(i) and shades(i) return the raw arrays without
+    building a grid. Records are found through the index, so they need not
+    be stored in id order.
+    """
+
+    def __init__(self, filepath):
+        self.filepath = filepath
+        header = np.fromfile(filepath, dtype=HEADER_DTYPE, count=1)
+        if len(header) == 0 or header[0]['magic'] != MAGIC:
+            raise ValueError("{0} is not a Kurodoko archive".format(filepath))
+        header = header[0]
+        if header['version'] != VERSION:
+            raise ValueError("Unsupported archive version {0}".format(header['version']))
+        self.grid_size = (int(header['height']), int(header['width']))
+        self.n_cells = self.grid_size[0] * self.grid_size[1]
+        self.record_size = int(header['record_size'])
+        assert self.record_size == record_dtype(self.grid_size).itemsize
+        self.count = int(header['count'])
+        if self.count == 0:
+            # memmap cannot map zero bytes.
+            self._records = np.zeros(0, dtype=record_dtype(self.grid_size))
+            self._index = np.zeros(0, dtype='<u8')
+        else:
+            self._records = np.memmap(filepath, dtype=record_dtype(self.grid_size), mode='r',
+                offset=HEADER_SIZE, shape=(self.count,))
+            self._index = np.memmap(filepath, dtype='<u8', mode='r',
+                offset=int(header['index_offset']), shape=(self.count,))
+
+    def __len__(self):
+        return self.count
+
+    def _record(self, i):
+        if i < 0:
+            i += self.count
+        if not 0 <= i < self.count:
+            raise IndexError("Archive has {0} puzzles, not {1}".format(self.count, i + 1))
+        return self._records[(int(self._index[i]) - HEADER_SIZE) // self.record_size]
+
+    def numbers(self, i):
+        return self._record(i)['clues'].reshape(self.grid_size)
+
+    def shades(self, i):
+        return unpack_shades(self._record(i)['shades'], self.n_cells).reshape(self.grid_size)
+
+    def __getitem__(self, i):
+        record = self._record(i)
+        grid = Kurodoko(self.grid_size)
+        grid.numbers = record['clues'].reshape(self.grid_size)
+        grid.shades = unpack_shades(record['shades'], self.n_cells).reshape(self.grid_size)
+        return grid
+
+    def __iter__(self):
+        for i in range(self.count):
+            yield self[i]
+
+def make_kurodoko_from_archive(filepath, i):
+    return KurodokoArchive(filepath)[i]
+
+def make_archive_from_kurodokos(grids, filepath):
+    return write_archive(grids, filepath)
+
+def make_archive_from_files(filepaths, archive_path):
+    """
+    Packs puzzle CSVs (as read by make_kurodoko_from_file) into an archive.
+    """
+    return write_archive((make_kurodoko_from_file(filepath) for filepath in filepaths), archive_path)
+
+def make_archive_from_lines(line_path, archive_path):
+    """
+    Packs a streaming-format file into an archive, one puzzle at a time.
+    """
+    return write_archive(iter_kurodokos_from_file(line_path), archive_path)
+
+def make_lines_from_archive(archive_path, line_path):
+    return write_kurodokos_to_file(KurodokoArchive(archive_path), line_path)
+
+def main(argv=None):
+    # Imported here, as batch_solve_kurodoko imports this module.
+    from batch_solve_kurodoko import find_puzzle_files
+
+    parser = argparse.ArgumentParser(description="Convert Kurodoko puzzles to and from binary archives.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    pack_parser = commands.add_parser("pack", help="pack puzzles into an archive")
+    pack_parser.add_argument("puzzles", help="streaming-format file, directory of CSVs or glob pattern")
+    pack_parser.add_argument("archive")
+    unpack_parser = commands.add_parser("unpack", help="write an archive out in the streaming format")
+    unpack_parser.add_argument("archive")
+    unpack_parser.add_argument("output")
+    info_parser = commands.add_parser("info", help="describe an archive")
+    info_parser.add_argument("archive")
+    args = parser.parse_args(argv)
+
+    if args.command == "pack":
+        if os.path.isfile(args.puzzles) and not args.puzzles.endswith(".csv"):
+            count = make_archive_from_lines(args.puzzles, args.archive)
+        else:
+            count = make_archive_from_files(find_puzzle_files(args.puzzles), args.archive)
+        print("Packed {0} puzzles into {1}".format(count, args.archive))
+    elif args.command == "unpack":
+        count = make_lines_from_archive(args.archive, args.output)
+        print("Unpacked {0} puzzles into {1}".format(count, args.output))
+    else:
+        archive = KurodokoArchive(args.archive)
+        count = len(archive)
+        print("{0}: {1} puzzles of {2}x{3}, {4} bytes per record".format(
+            args.archive, count, archive.grid_size[0], archive.grid_size[1], archive.record_size))
+    return count
+
+if __name__ == "__main__":
+    main()
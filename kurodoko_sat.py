@@ -0,0 +1,549 @@
+"""
+Solves Kurodoko grids by encoding them as CNF.
+
+Variable i + 1 is true if cell i (flat index) is black. The encoding has:
+
+- unit clauses for numbered cells (white) and cells already shaded;
+- a binary clause forbidding each pair of adjacent black cells;
+- for each clue, "reach" variables: reach[d][j] is true if the clue sees
+  at least j cells in direction d. A sequential counter over all of them
+  makes exactly N-1 true.
+
+White connectivity is not encoded up front. Instead, each model is
+checked, and for every white component apart from the largest a cut
+clause is added: with u in the component, v in the largest one, and
+the black cells around the component, "u is black, or v is black, or
+one of those cells is white". Any connected solution satisfies this,
+since a white path from u to v has to cross that ring. The solver is
+then run again, until the model is connected or the CNF is
+unsatisfiable.
+
+The built-in CDCLSolver is pure Python. To use a locally installed SAT
+solver instead, pass its command line (e.g. ["kissat"] or
+["cadical"]); the CNF is handed to it in DIMACS format.
+"""
+import heapq
+import os
+import subprocess
+import tempfile
+import time
+
+import numpy as np
+
+from connectivity import label_components
+from visibility import DIRECTIONS
+
+class KurodokoCNF(object):
+    """
+    The CNF of a grid (without connectivity, see cut_clauses). Clauses are
+    lists of non-zero ints, DIMACS style. Encoding a large grid takes a
+    while, so the deadline of budget, if given, is checked between clues.
+    """
+
+    def __init__(self, grid, budget=None):
+        self.grid_size = grid.grid_size
+        self.topology = grid.topology
+        self.n_vars = grid.height * grid.width
+        self.clauses = []
+        cells = grid.shades.ravel().tolist()
+        numbers = grid.numbers.ravel().tolist()
+        for idx in range(self.n_vars):
+            if numbers[idx] > 0 or cells[idx] == 1:
+                self.clauses.append([-self.black_var(idx)])
+            elif cells[idx] == -1:
+                self.clauses.append([self.black_var(idx)])
+            for neighbour in self.topology.neighbour_indices[idx]:
+                if neighbour > idx:
+                    self.clauses.append([-self.black_var(idx), -self.black_var(neighbour)])
+        for idx in range(self.n_vars):
+            if numbers[idx] > 0:
+                if budget is not None:
+                    budget.check()
+                self.add_clue(idx, numbers[idx])
+
+    def black_var(self, idx):
+        return idx + 1
+
+    def new_var(self):
+        self.n_vars += 1
+        return self.n_vars
+
+    def add_clue(self, idx, number):
+        """
+        Adds the reach variables of the clue at idx, and a sequential
+        counter making exactly number - 1 of them true.
+        """
+        reach_vars = []
+        for direction in DIRECTIONS:
+            previous = None
+            # Seeing number cells one way is already too many, so the ray
+            # is cut off there.
+            for j, ray_idx in enumerate(self.topology.ray_indices[direction][idx][:number]):
+                reach = self.new_var()
+                black = self.black_var(ray_idx)
+                # reach <-> previous reach and cell j not black
+                self.clauses.append([-reach, -black])
+                if previous is None:
+                    self.clauses.append([reach, black])
+                else:
+                    self.clauses.append([-reach, previous])
+                    self.clauses.append([reach, black, -previous])
+                reach_vars.append(reach)
+                previous = reach
+        self.add_exactly(reach_vars, number - 1)
+
+    def add_exactly(self, literals, k):
+        """
+        Sinz's sequential counter, with both directions of each
+        implication: counts[j] is true if at least j + 1 of the literals
+        seen so far are true.
+        """
+        if k > len(literals):
+            self.clauses.append([])
+            return
+        counts = []
+        for literal in literals:
+            new_counts = []
+            for j in range(min(len(counts) + 1, k + 1)):
+                count = self.new_var()
+                below = counts[j - 1] if j > 0 else None
+                same = counts[j] if j < len(counts) else None
+                # count <- same, and count <- below and literal
+                if same is not None:
+                    self.clauses.append([count, -same])
+                self.clauses.append([count, -literal] + ([-below] if below is not None else []))
+                # count -> same or literal, and count -> same or below
+                self.clauses.append([-count] + ([same] if same is not None else []) + [literal])
+                if below is not None:
+                    self.clauses.append([-count] + ([same] if same is not None else []) + [below])
+                new_counts.append(count)
+            counts = new_counts
+        if k > 0:
+            self.clauses.append([counts[k - 1]])
+        if k < len(counts):
+            self.clauses.append([-counts[k]])
+
+    def shades_from_model(self, model):
+        """
+        Maps a model (model[v] is the value of variable v) to a shades array.
+        """
+        n_cells = self.grid_size[0] * self.grid_size[1]
+        black = np.array([model[self.black_var(idx)] for idx in range(n_cells)])
+        return np.where(black, -1, 1).astype(np.int8).reshape(self.grid_size)
+
+    def cut_clauses(self, shades):
+        """
+        Returns the cut clauses for a model whose white cells are split, one
+        per component apart from the largest; none if they are connected.
+        """
+        labels, n_components = label_components(shades >= 0)
+        if n_components < 2:
+            return []
+        sizes = [0] * n_components
+        for label in labels:
+            if label != -1:
+                sizes[label] += 1
+        largest = sizes.index(max(sizes))
+        v = labels.index(largest)
+        clauses = []
+        for component in range(n_components):
+            if component == largest:
+                continue
+            members = [idx for idx, label in enumerate(labels) if label == component]
+            ring = set()
+            for idx in members:
+                for neighbour in self.topology.neighbour_indices[idx]:
+                    if labels[neighbour] == -1:
+                        ring.add(neighbour)
+            clause = [self.black_var(members[0]), self.black_var(v)]
+            clause += [-self.black_var(idx) for idx in sorted(ring)]
+            clauses.append(clause)
+        return clauses
+
+    def write_dimacs(self, textfile):
+        write_cnf(textfile, self.n_vars, self.clauses)
+
+def write_cnf(textfile, n_vars, clauses):
+    textfile.write("p cnf {0} {1}\n".format(n_vars, len(clauses)))
+    for clause in clauses:
+        textfile.write(" ".join([str(literal) for literal in clause]) + " 0\n")
+
+def luby(i):
+    """
+    The i-th term (from 0) of the Luby sequence 1, 1, 2, 1, 1, 2, 4, ...
+    """
+    size, power = 1, 0
+    while size < i + 1:
+        power += 1
+        size = 2 * size + 1
+    while size - 1 != i:
+        size = (size - 1) // 2
+        power -= 1
+        i %= size
+    return 2 ** power
+
+class CDCLSolver(object):
+    """
+    A small conflict-driven clause learning solver: two watched literals,
+    first-UIP learning with backjumping, activity-ordered decisions and
+    phase saving (starting with every variable false). It restarts after
+    restart_unit times the next Luby number of conflicts. Once there are
+    more than max_learnts learnt clauses, the half with the most decision
+    levels (LBD) is deleted, apart from binary and glue (LBD <= 2)
+    clauses, and the limit grows by a tenth. Clauses can be added between
+    calls to solve(), and the learnt clauses that survive are kept.
+    """
+
+    def __init__(self, n_vars=0, restart_unit=100, max_learnts=2000):
+        self.n_vars = 0
+        self.clauses = []
+        # LBD of each clause, 0 for clauses that were not learnt.
+        self.lbds = []
+        self.n_learnts = 0
+        self.max_learnts = max_learnts
+        self.restart_unit = restart_unit
+        self.restarts = 0
+        self.watches = {}
+        self.values = [0]
+        self.levels = [0]
+        self.reasons = [None]
+        self.phases = [False]
+        self.activity = [0.0]
+        # Entries are (-activity, variable); one whose activity is out of
+        # date is skipped when popped, and queued[variable] is true while
+        # the variable has an up to date entry.
+        self.heap = []
+        self.queued = [False]
+        self.increment = 1.0
+        self.trail = []
+        self.trail_limits = []
+        self.head = 0
+        self.ok = True
+        self.ensure_vars(n_vars)
+
+    def ensure_vars(self, n_vars):
+        while self.n_vars < n_vars:
+            self.n_vars += 1
+            self.values.append(0)
+            self.levels.append(0)
+            self.reasons.append(None)
+            self.phases.append(False)
+            self.activity.append(0.0)
+            self.queued.append(True)
+            self.watches[self.n_vars] = []
+            self.watches[-self.n_vars] = []
+            heapq.heappush(self.heap, (0.0, self.n_vars))
+
+    def value(self, literal):
+        value = self.values[abs(literal)]
+        return value if literal > 0 else -value
+
+    def add_clause(self, clause):
+        """
+        Adds a clause, simplified against the top-level assignments.
+        """
+        if not self.ok:
+            return
+        self._backtrack(0)
+        self.ensure_vars(max([abs(literal) for literal in clause] + [0]))
+        literals = []
+        for literal in clause:
+            value = self.value(literal)
+            if value == 1 or -literal in literals:
+                return
+            if value == 0 and literal not in literals:
+                literals.append(literal)
+        if not literals:
+            self.ok = False
+        elif len(literals) == 1:
+            self._assign(literals[0], None)
+        else:
+            self._attach(literals)
+
+    def _attach(self, literals, lbd=0):
+        self.clauses.append(literals)
+        self.lbds.append(lbd)
+        index = len(self.clauses) - 1
+        self.watches[literals[0]].append(index)
+        self.watches[literals[1]].append(index)
+        return index
+
+    def _assign(self, literal, reason):
+        variable = abs(literal)
+        self.values[variable] = 1 if literal > 0 else -1
+        self.levels[variable] = len(self.trail_limits)
+        self.reasons[variable] = reason
+        self.trail.append(literal)
+
+    def _propagate(self):
+        """
+        Returns the index of a conflicting clause, or None.
+        """
+        # value() is inlined here, as this loop is where the time goes.
+        values, clauses, watches, trail = self.values, self.clauses, self.watches, self.trail
+        while self.head < len(trail):
+            false_literal = -trail[self.head]
+            self.head += 1
+            watching = watches[false_literal]
+            kept = []
+            for position, index in enumerate(watching):
+                clause = clauses[index]
+                if clause[0] == false_literal:
+                    clause[0], clause[1] = clause[1], clause[0]
+                first = clause[0]
+                if (values[first] if first > 0 else -values[-first]) == 1:
+                    kept.append(index)
+                    continue
+                for k in range(2, len(clause)):
+                    literal = clause[k]
+                    if (values[literal] if literal > 0 else -values[-literal]) != -1:
+                        clause[1], clause[k] = literal, clause[1]
+                        watches[literal].append(index)
+                        break
+                else:
+                    kept.append(index)
+                    if (values[first] if first > 0 else -values[-first]) == -1:
+                        kept.extend(watching[position + 1:])
+                        watches[false_literal] = kept
+                        return index
+                    self._assign(first, index)
+            watches[false_literal] = kept
+        return None
+
+    def _analyze(self, conflict):
+        """
+        Returns the first-UIP learnt clause (asserting literal first, then
+        the literal of the backjump level) and the level to backjump to.
+        """
+        level = len(self.trail_limits)
+        learnt = [None]
+        seen = set()
+        pending = 0
+        literal = None
+        position = len(self.trail) - 1
+        clause = self.clauses[conflict]
+        while True:
+            for other in (clause if literal is None else clause[1:]):
+                variable = abs(other)
+                if variable not in seen and self.levels[variable] > 0:
+                    seen.add(variable)
+                    self._bump(variable)
+                    if self.levels[variable] == level:
+                        pending += 1
+                    else:
+                        learnt.append(other)
+            while abs(self.trail[position]) not in seen:
+                position -= 1
+            literal = self.trail[position]
+            position -= 1
+            pending -= 1
+            if pending == 0:
+                break
+            clause = self.clauses[self.reasons[abs(literal)]]
+        learnt[0] = -literal
+        if len(learnt) == 1:
+            return learnt, 0
+        deepest = max(range(1, len(learnt)), key=lambda i: self.levels[abs(learnt[i])])
+        learnt[1], learnt[deepest] = learnt[deepest], learnt[1]
+        return learnt, self.levels[abs(learnt[1])]
+
+    def _bump(self, variable):
+        self.activity[variable] += self.increment
+        if self.activity[variable] > 1e100:
+            self.activity = [activity * 1e-100 for activity in self.activity]
+            self.increment *= 1e-100
+            self.heap = [(-self.activity[v], v) for v in range(1, self.n_vars + 1)]
+            heapq.heapify(self.heap)
+            self.queued = [False] + [True] * self.n_vars
+        heapq.heappush(self.heap, (-self.activity[variable], variable))
+        self.queued[variable] = True
+
+    def _backtrack(self, level):
+        if len(self.trail_limits) <= level:
+            return
+        start = self.trail_limits[level]
+        for literal in self.trail[start:]:
+            variable = abs(literal)
+            self.phases[variable] = literal > 0
+            self.values[variable] = 0
+            self.reasons[variable] = None
+            if not self.queued[variable]:
+                heapq.heappush(self.heap, (-self.activity[variable], variable))
+                self.queued[variable] = True
+        del self.trail[start:]
+        del self.trail_limits[level:]
+        self.head = len(self.trail)
+
+    def _pick_variable(self):
+        while self.heap:
+            activity, variable = heapq.heappop(self.heap)
+            if -activity != self.activity[variable]:
+                continue
+            self.queued[variable] = False
+            if self.values[variable] == 0:
+                return variable
+        return None
+
+    def solve(self, budget=None):
+        """
+        Returns a model as a list of booleans indexed by variable (index 0
+        is unused), or None if the clauses are unsatisfiable. Every decision
+        is charged to budget (a budget.Budget) as a node, if given.
+        """
+        if not self.ok:
+            return None
+        self._backtrack(0)
+        conflicts = 0
+        restart_at = self.restart_unit * luby(self.restarts)
+        while True:
+            conflict = self._propagate()
+            if conflict is not None:
+                if not self.trail_limits:
+                    self.ok = False
+                    return None
+                learnt, level = self._analyze(conflict)
+                self._backtrack(level)
+                if len(learnt) == 1:
+                    self._assign(learnt[0], None)
+                else:
+                    lbd = len(set([self.levels[abs(literal)] for literal in learnt]))
+                    self._assign(learnt[0], self._attach(learnt, lbd))
+                    self.n_learnts += 1
+                self.increment /= 0.95
+                conflicts += 1
+            elif conflicts >= restart_at or self.n_learnts > self.max_learnts:
+                self._backtrack(0)
+                if self.n_learnts > self.max_learnts:
+                    self._reduce_learnts()
+                self.restarts += 1
+                conflicts = 0
+                restart_at = self.restart_unit * luby(self.restarts)
+            else:
+                variable = self._pick_variable()
+                if variable is None:
+                    return [False] + [value == 1 for value in self.values[1:]]
+                if budget is not None:
+                    budget.spend_node()
+                self.trail_limits.append(len(self.trail))
+                self._assign(variable if self.phases[variable] else -variable, None)
+
+    def _reduce_learnts(self):
+        """
+        Deletes the worse half of the learnt clauses and renumbers the
+        rest. Only called at level 0, where no reason is ever looked at.
+        """
+        candidates = [index for index, lbd in enumerate(self.lbds) if lbd > 2 and len(self.clauses[index]) > 2]
+        candidates.sort(key=lambda index: -self.lbds[index])
+        deleted = set(candidates[:len(candidates) // 2])
+        self.clauses = [clause for index, clause in enumerate(self.clauses) if index not in deleted]
+        self.lbds = [lbd for index, lbd in enumerate(self.lbds) if index not in deleted]
+        self.n_learnts -= len(deleted)
+        self.max_learnts += self.max_learnts // 10
+        for literals in self.watches.values():
+            del literals[:]
+        for index, clause in enumerate(self.clauses):
+            self.watches[clause[0]].append(index)
+            self.watches[clause[1]].append(index)
+        for literal in self.trail:
+            self.reasons[abs(literal)] = None
+
+class ExternalSolver(object):
+    """
+    Runs a SAT solver executable on the CNF in DIMACS format, and reads
+    back the model from the "s"/"v" lines of SAT competition output, as
+    printed by kissat, cadical and others. Exit codes other than 0, 10
+    (satisfiable) and 20 (unsatisfiable) are treated as solver failures.
+    """
+
+    def __init__(self, command):
+        self.command = list(command)
+        self.n_vars = 0
+        self.clauses = []
+
+    def add_clause(self, clause):
+        self.clauses.append(list(clause))
+        self.n_vars = max([self.n_vars] + [abs(literal) for literal in clause])
+
+    def solve(self, budget=None):
+        """
+        Runs the solver, killing it if budget (a budget.Budget) reaches its
+        deadline first.
+        """
+        timeout = None
+        if budget is not None and budget.deadline is not None:
+            timeout = max(0.0, budget.deadline - time.monotonic())
+        handle, path = tempfile.mkstemp(suffix=".cnf")
+        try:
+            with os.fdopen(handle, "w") as textfile:
+                write_cnf(textfile, self.n_vars, self.clauses)
+            try:
+                completed = subprocess.run(self.command + [path], stdout=subprocess.PIPE,
+                    universal_newlines=True, timeout=timeout)
+            except subprocess.TimeoutExpired:
+                budget.exceed("deadline")
+        finally:
+            os.remove(path)
+        if completed.returncode not in (0, 10, 20):
+            raise RuntimeError("{0} exited with status {1}".format(self.command[0], completed.returncode))
+        return parse_model(completed.stdout, self.n_vars)
+
+def parse_model(output, n_vars):
+    """
+    Parses SAT competition style solver output into a model, or None if
+    the solver reports UNSATISFIABLE. Raises RuntimeError unless the output
+    has an "s SATISFIABLE" or "s UNSATISFIABLE" status line, since
+    anything else (UNKNOWN, no output, a crash) says nothing about the
+    clauses.
+    """
+    model = [False] * (n_vars + 1)
+    status = None
+    for line in output.splitlines():
+        if line.startswith("s "):
+            status = line[2:].strip()
+        elif line.startswith("v "):
+            for literal in line[2:].split():
+                literal = int(literal)
+                if literal > 0 and literal <= n_vars:
+                    model[literal] = True
+    if status == "UNSATISFIABLE":
+        return None
+    if status != "SATISFIABLE":
+        raise RuntimeError("SAT solver gave no result (status: {0})".format(status))
+    return model
+
+def solve_with_sat(grid, command=None, max_rounds=10000, budget=None):
+    """
+    Solves grid through its CNF, with the built-in CDCLSolver or the
+    external solver given by command, adding cut clauses until the model is
+    connected. Returns 1 (and assigns the solution into grid) or -1 if there
+    is no solution. Cells already shaded in grid are kept.
+    
+    If a budget.Budget is given, raises budget.BudgetExceeded once it runs
+    out, leaving grid unchanged.
+    """
+    cnf = KurodokoCNF(grid, budget)
+    solver = CDCLSolver(cnf.n_vars) if command is None else ExternalSolver(command)
+    for i, clause in enumerate(cnf.clauses):
+        if budget is not None and i % 1000 == 0:
+            budget.check()
+        solver.add_clause(clause)
+    for _ in range(max_rounds):
+        model = solver.solve(budget)
+        if model is None:
+            return -1
+        shades = cnf.shades_from_model(model)
+        cuts = cnf.cut_clauses(shades)
+        if not cuts:
+            grid.adopt_shades(shades)
+            return 1
+        for clause in cuts:
+            cnf.clauses.append(clause)
+            solver.add_clause(clause)
+    raise RuntimeError("No connected model after {0} rounds".format(max_rounds))
+
+def write_dimacs(grid, filepath):
+    """
+    Writes the CNF of grid (without cut clauses) to filepath.
+    """
+    with open(filepath, "w") as textfile:
+        KurodokoCNF(grid).write_dimacs(textfile)
@@ -0,0 +1,117 @@
+"""
+Event-driven scheduling for the direct deduction rules.
+
+The solvers used to run every rule on every cell in each pass. A Worklist
+instead records which cells could possibly give a new result:
+
+- a numbered cell only needs its clue rules re-run once some cell in its
+  row or column has changed since they last ran;
+- deduce_dont_split_grid can only fire on blank cells that touch a black
+  cell or would split the open cells, and that set only changes when a cell
+  is blackened.
+
+Cells are still visited in increasing flat index within a pass, so the
+sequence of changes (and solving_iterations) is exactly what a full sweep
+produces; only rule evaluations that could not change anything are skipped.
+"""
+import heapq
+
+import numpy as np
+
+class Worklist(object):
+
+    def __init__(self, grid):
+        self.grid = grid
+        numbered = np.flatnonzero(grid.numbers.ravel() > 0).tolist()
+        self.clues_in_row = [[] for _ in range(grid.height)]
+        self.clues_in_col = [[] for _ in range(grid.width)]
+        for idx in numbered:
+            row, col = divmod(idx, grid.width)
+            self.clues_in_row[row].append(idx)
+            self.clues_in_col[col].append(idx)
+        # Clue cells whose rules have not run since their lines last changed.
+        self.dirty_clues = set(numbered)
+        self.heap = []
+        self.in_heap = set()
+        self.next_pass = set(numbered)
+        self.position = -1
+        self.split_candidates_stale = True
+        self.rule_firings = 0
+
+    def cell_changed(self, row, col, old_shade, shade):
+        for idx in self.clues_in_row[row]:
+            self.mark_clue(idx)
+        for idx in self.clues_in_col[col]:
+            self.mark_clue(idx)
+        if -1 in (old_shade, shade):
+            self.split_candidates_stale = True
+
+    def mark_clue(self, idx):
+        self.dirty_clues.add(idx)
+        self._push(idx)
+
+    def take_clue(self, idx):
+        """
+        Returns True (and clears the flag) if the clue at idx is dirty.
+        """
+        if idx in self.dirty_clues:
+            self.dirty_clues.remove(idx)
+            return True
+        return False
+
+    def _push(self, idx):
+        # Cells the current pass has not reached yet are handled in this
+        # pass, as a sweep would; the rest wait for the next one.
+        if idx > self.position:
+            if idx not in self.in_heap:
+                self.in_heap.add(idx)
+                heapq.heappush(self.heap, idx)
+        else:
+            self.next_pass.add(idx)
+
+    def start_pass(self):
+        self.position = -1
+        for idx in self.next_pass:
+            self._push(idx)
+        self.next_pass = set()
+        self.split_candidates_stale = True
+
+    def pop(self):
+        """
+        Returns the next flat index to visit in this pass, or None once the
+        pass is over.
+        """
+        if self.split_candidates_stale:
+            self._queue_split_candidates()
+        if not self.heap:
+            return None
+        idx = heapq.heappop(self.heap)
+        self.in_heap.remove(idx)
+        self.position = idx
+        return idx
+
+    def _queue_split_candidates(self):
+        """
+        Queues every blank cell that deduce_dont_split_grid could make white:
+        those with a black neighbour, and those whose blackening would cut
+        off a region.
+        """
+        self.split_candidates_stale = False
+        grid = self.grid
+        shades = grid.shades
+        black = shades == -1
+        touches_black = np.zeros_like(black)
+        touches_black[1:, :] |= black[:-1, :]
+        touches_black[:-1, :] |= black[1:, :]
+        touches_black[:, 1:] |= black[:, :-1]
+        touches_black[:, :-1] |= black[:, 1:]
+        blank = (shades == 0).ravel()
+        analysis = grid.open_cell_analysis()
+        if analysis.n_components > 1:
+            candidates = blank
+        else:
+            candidates = blank & touches_black.ravel()
+            for idx in analysis.articulation_points:
+                candidates[idx] = blank[idx]
+        for idx in np.flatnonzero(candidates[self.position + 1:]).tolist():
+            self._push(idx + self.position + 1)
@@ -1,29 +1,178 @@
-from copy import deepcopy
+import os
+import time
 import numpy as np
 import csv
+from concurrent.futures import wait
+from visibility import DIRECTIONS, VisibilityEngine
+from bitboard import BitboardEngine
+from connectivity import CutAnalysis, SpanningTree, label_components, reachable_cells
+from topology import get_topology
+from propagation import Worklist
+from clue_splits import achievable_counts, lowest_count
+from instrumentation import SolverStats, make_instrumented_class
+from kurodoko_sat import solve_with_sat
+from budget import TIMEOUT, BudgetExceeded
+
+# Engines that can back the cached solving state; pick one with
+# Kurodoko(..., backend=name).
+BACKENDS = {
+    'numpy': VisibilityEngine,
+    'bitboard': BitboardEngine,
+}
+DEFAULT_BACKEND = 'numpy'
+
+class CacheStatus(object):
+    """
+    Whether a grid's cached solving state has to be rebuilt before it is
+    next queried. Shared by the grid and the arrays it hands out.
+    """
+    __slots__ = ['stale']
+    
+    def __init__(self):
+        self.stale = True
+
+class WatchedArray(np.ndarray):
+    """
+    The shades and numbers arrays a Kurodoko hands out. Writing to one, or
+    to a view of one, directly (grid.shades[row, col] = -1) marks the
+    grid's cached state stale. Copies and the results of arithmetic are
+    plain arrays.
+    """
+    
+    def __array_finalize__(self, obj):
+        self.cache_status = getattr(obj, 'cache_status', None) if self.base is not None else None
+    
+    def __array_wrap__(self, array, context=None, return_scalar=False):
+        array = array.view(np.ndarray)
+        return array[()] if return_scalar else array
+    
+    def __setitem__(self, key, value):
+        np.ndarray.__setitem__(self, key, value)
+        if self.cache_status is not None:
+            self.cache_status.stale = True
+
+def watched_view(array, cache_status):
+    view = array.view(WatchedArray)
+    view.cache_status = cache_status
+    return view
 
 def unfold_list_of_lists(list_of_lists):
     return [item for sublist in list_of_lists for item in sublist]
 
 class Kurodoko(object):
+    """
+    Board state is kept compact, since the solver keeps many of these alive:
+    shades live in a flat int8 buffer (exposed as the 2D view self.shades),
+    clones share the state derived from the board until they change it,
+    and internal bookkeeping refers to cells by flat index row * width + col.
+    """
+    
+    __slots__ = [
+        'grid_size', 'height', 'width', 'topology', 'valid_coords', 'backend',
+        '_cells', '_shades_view', '_shades_watched', '_numbers', '_numbers_view',
+        '_cache_status', '_state_shared', '_visibility_engine',
+        '_adjacent_black_pairs', '_black_numbered_cells', '_clues_seeing_wrong_number',
+        '_black_version', '_cut_analysis', '_cut_analysis_version', '_cut_analysis_black',
+        '_spanning_tree', '_disconnected_version',
+        '_trail', '_trail_marks', '_worklists', '_board_hash', 'transposition_table',
+        'reasonings', 'solving_iterations', 'rule_firings', 'search_nodes', 'stats', 'budget',
+    ]
     
-    def __init__(self, grid_size, set_numbers=None, set_shades=None):
+    def __init__(self, grid_size, set_numbers=None, set_shades=None, backend=None):
         
         assert len(grid_size)==2
-        self.grid_size = grid_size
+        if backend is None:
+            backend = DEFAULT_BACKEND
+        assert backend in BACKENDS
+        self.backend = backend
+        self.grid_size = tuple(grid_size)
         self.height = grid_size[0]
         self.width = grid_size[1]
-        self.numbers = np.zeros(grid_size, dtype=int)
+        # Incremental solving state; see _rebuild_state().
+        self._cache_status = CacheStatus()
+        # Numbers are 0 if unset, else >= 1
+        self.numbers = np.zeros(grid_size, dtype=np.int16)
         # Shades are 0 if blank, 1 for white and -1 for black
-        self.shades = np.zeros(grid_size, dtype=int)
-        self.valid_coords = [(i,j) for i in range(self.height) for j in range(self.width)]
+        self.shades = np.zeros(grid_size, dtype=np.int8)
+        # Neighbour and line-of-sight tables, shared by all grids of this size.
+        self.topology = get_topology(grid_size)
+        self.valid_coords = self.topology.valid_coords
+        self._visibility_engine = None
+        self._adjacent_black_pairs = 0
+        self._black_numbered_cells = 0
+        self._clues_seeing_wrong_number = set()
+        # Whether the state above is shared with a clone; see clone().
+        self._state_shared = False
+        # Bumped whenever the set of black cells changes; keys _cut_analysis.
+        self._black_version = 0
+        self._cut_analysis = None
+        self._cut_analysis_version = None
+        self._cut_analysis_black = None
+        # Certificate that the open cells are connected; see
+        # _open_cells_connected().
+        self._spanning_tree = None
+        self._disconnected_version = None
+        # Undo trail of (flat index, previous shade); see checkpoint().
+        self._trail = []
+        self._trail_marks = []
+        # Worklists of the solves in progress, notified of every change.
+        self._worklists = []
+        # Zobrist hash of the shades, kept up to date by _set_shade().
+        self._board_hash = 0
+        # Optional transposition.TranspositionTable memoizing conjecture
+        # solves; shared by clones.
+        self.transposition_table = None
+        self.reasonings = []
+        self.solving_iterations = 0
+        self.rule_firings = 0
+        self.search_nodes = 0
+        # SolverStats of a profiled solve; see solve(profile=True).
+        self.stats = None
+        # budget.Budget charged by the solve in progress, if any.
+        self.budget = None
         if set_numbers is not None:
             self.set_numbers(set_numbers)
-        # Numbers are 0 if unset, else >= 1
         if set_shades is not None:
             for coord in set_shades:
                 self.set_shade_black(*coord)
-        self.reasonings = []
+    
+    def __getstate__(self):
+        # Views would be pickled as separate copies of their arrays, so
+        # they are left out and recreated by __setstate__().
+        views = ['_shades_view', '_shades_watched', '_numbers_view', '_cache_status']
+        return dict([(name, getattr(self, name)) for name in self.__slots__ if name not in views and hasattr(self, name)])
+    
+    def __setstate__(self, state):
+        for name, value in state.items():
+            setattr(self, name, value)
+        self._cache_status = CacheStatus()
+        self.shades = self._cells.reshape(self.grid_size)
+        self.numbers = self._numbers
+    
+    @property
+    def shades(self):
+        return self._shades_watched
+    
+    @shades.setter
+    def shades(self, shades):
+        cells = np.array(shades, dtype=np.int8)
+        assert cells.shape == self.grid_size
+        self._cells = cells.reshape(-1)
+        self._shades_view = self._cells.reshape(self.grid_size)
+        self._shades_watched = watched_view(self._shades_view, self._cache_status)
+        self._cache_status.stale = True
+    
+    @property
+    def numbers(self):
+        return self._numbers_view
+    
+    @numbers.setter
+    def numbers(self, numbers):
+        numbers = np.array(numbers, dtype=np.int16)
+        assert numbers.shape == self.grid_size
+        self._numbers = numbers
+        self._numbers_view = watched_view(numbers, self._cache_status)
+        self._cache_status.stale = True
     
     def numbered_cells(self):
         return [coord for coord in self.valid_coords if self.numbers[coord]>0]
@@ -79,11 +228,120 @@ class Kurodoko(object):
         """
         neighbours = self.get_neighbours(row, col)
         assert self.shades[row, col] <= 0
+        assert self.visibility().black_neighbours(self._shades_view, row, col) == 0
+        self.assign((row, col), -1)
         for coord in neighbours:
-            assert self.shades[coord] >= 0
-        self.shades[row, col] = -1
-        for coord in neighbours:
-            self.shades[coord] = 1
+            self.assign(coord, 1)
+    
+    def assign(self, coord, shade):
+        """
+        Sets the shade of one cell and updates the cached solving state
+        (visibility, black adjacency and clue errors) for its row and column
+        only. Solver code should change shades through here rather than
+        writing to self.shades directly.
+        
+        While a checkpoint is open, the previous shade is pushed onto the
+        trail so that rollback() can restore it.
+        """
+        self._sync_state()
+        idx = coord[0] * self.width + coord[1]
+        old_shade = self._cells[idx]
+        if old_shade == shade:
+            return
+        if self._trail_marks:
+            self._trail.append((idx, old_shade))
+        self._set_shade(idx, shade)
+    
+    def checkpoint(self):
+        """
+        Marks the current state so that every assignment made from now on
+        can be undone with rollback(). Checkpoints nest.
+        """
+        self._trail_marks.append(len(self._trail))
+    
+    def rollback(self):
+        """
+        Undoes all assignments made since the most recent checkpoint, and
+        removes that checkpoint.
+        """
+        mark = self._trail_marks.pop()
+        while len(self._trail) > mark:
+            idx, shade = self._trail.pop()
+            self._set_shade(idx, shade)
+    
+    def _set_shade(self, idx, shade):
+        self._sync_state()
+        if self._state_shared:
+            self._unshare_state()
+        row, col = divmod(idx, self.width)
+        old_shade = self._cells[idx]
+        self._cells[idx] = shade
+        zobrist_keys = self.topology.zobrist_keys[idx]
+        self._board_hash ^= zobrist_keys[int(old_shade) + 1] ^ zobrist_keys[int(shade) + 1]
+        if -1 in (old_shade, shade):
+            self._black_version += 1
+            change = 1 if shade == -1 else -1
+            self._adjacent_black_pairs += change * self._visibility_engine.black_neighbours(self._shades_view, row, col)
+            if self._numbers[row, col] > 0:
+                self._black_numbered_cells += change
+            if shade == -1:
+                self._spanning_tree.close(idx)
+            else:
+                self._spanning_tree.reopen(idx)
+        self._visibility_engine.update(self._shades_view, row, col, old_shade)
+        for worklist in self._worklists:
+            worklist.cell_changed(row, col, old_shade, shade)
+        for clue_col in np.flatnonzero(self._numbers[row, :]):
+            self._update_clue_status(row, clue_col)
+        for clue_row in np.flatnonzero(self._numbers[:, col]):
+            self._update_clue_status(clue_row, col)
+    
+    def _update_clue_status(self, row, col):
+        # Same tests as _cell_sees_too_much/_cell_sees_too_little, reading
+        # the totals directly since the state is already in sync here.
+        number = self._numbers[row, col]
+        n_white = self._visibility_engine.total(row, col, 1)
+        n_open = self._visibility_engine.total(row, col, 0)
+        if n_white + 1 > number or n_open + 1 < number:
+            self._clues_seeing_wrong_number.add((row, col))
+        else:
+            self._clues_seeing_wrong_number.discard((row, col))
+    
+    def _sync_state(self):
+        """
+        The cached state is kept current by _set_shade(). Replacing shades
+        or numbers, or writing to either array directly, marks it stale
+        (see WatchedArray), and it is then rebuilt from scratch.
+        """
+        if self._cache_status.stale:
+            self._rebuild_state()
+    
+    def _unshare_state(self):
+        """
+        Gives this grid its own copies of the cached state it shares with
+        a clone (see clone()), before changing it.
+        """
+        self._visibility_engine = self._visibility_engine.copy()
+        self._spanning_tree = self._spanning_tree.copy()
+        self._clues_seeing_wrong_number = set(self._clues_seeing_wrong_number)
+        self._state_shared = False
+    
+    def _rebuild_state(self):
+        self._cache_status.stale = False
+        self._state_shared = False
+        self._visibility_engine = BACKENDS[self.backend](self._shades_view)
+        self._black_version += 1
+        self._spanning_tree = SpanningTree(self.topology)
+        zobrist_keys = self.topology.zobrist_keys
+        self._board_hash = 0
+        for idx, shade in enumerate(self._cells.tolist()):
+            self._board_hash ^= zobrist_keys[idx][shade + 1]
+        black = self._shades_view == -1
+        self._adjacent_black_pairs = self._visibility_engine.adjacent_black_pairs(self._shades_view)
+        self._black_numbered_cells = int(np.sum(black & (self._numbers > 0)))
+        self._clues_seeing_wrong_number = set()
+        for coord in self.numbered_cells():
+            self._update_clue_status(*coord)
     
     def _is_filled_out(self):
         """
@@ -95,25 +353,38 @@ class Kurodoko(object):
         return self._is_filled_out() and not self._any_regions_cut_off(1)
     
     def _any_regions_cut_off(self, thresh):
-        white_cells = self.get_all_white_cells(thresh=thresh)
-        if len(white_cells) == 0:
-            # There cannot be any cut-off regions if there are no white regions.
+        # There cannot be any cut-off regions if there are no white regions.
+        if thresh == 0:
+            return not self._open_cells_connected()
+        return label_components(self.shades >= thresh)[1] > 1
+    
+    def _open_cells_connected(self):
+        """
+        Answers from the spanning tree certificate while it is valid, which
+        it stays through most single blackenings and their rollbacks (see
+        connectivity.SpanningTree), and only flood fills otherwise.
+        """
+        self._sync_state()
+        if self._spanning_tree.valid:
+            return True
+        if self._cut_analysis_version == self._black_version:
+            return self._cut_analysis.n_components <= 1
+        if self._disconnected_version == self._black_version:
             return False
-        else:
-            one_cell = list(white_cells)[0]
-            connected_cells = self.collect_contiguous_cells_from(one_cell[0], one_cell[1], thresh)
-            return set(connected_cells) != set(white_cells)
+        if self._state_shared:
+            self._unshare_state()
+        if self._spanning_tree.build(self._shades_view >= 0):
+            return True
+        self._disconnected_version = self._black_version
+        return False
     
     def _any_black_cells_adjoin_each_other(self):
         """
         This should return False if the set B of all black cells
         and the set of all neighbours of members of B are disjoint.
         """
-        black_cells = self.black_cells()
-        neighbours_of_black_cells = []
-        for coord in black_cells:
-            neighbours_of_black_cells += self.get_neighbours(*coord)
-        return set.intersection(set(black_cells), set(neighbours_of_black_cells)) != set()
+        self._sync_state()
+        return self._adjacent_black_pairs > 0
     
     def _cell_sees_too_much(self, row, col):
         """
@@ -134,14 +405,12 @@ class Kurodoko(object):
             return False
     
     def _any_cell_sees_wrong_number(self):
-        coords = self.numbered_cells()
-        any_too_much = any([self._cell_sees_too_much(*coord) for coord in coords])
-        any_too_little = any([self._cell_sees_too_little(*coord) for coord in coords])
-        return any_too_much or any_too_little
+        self._sync_state()
+        return len(self._clues_seeing_wrong_number) > 0
     
     def _any_numbered_cell_black(self):
-        coords = self.numbered_cells()
-        return any([self.shades[coord]==-1 for coord in coords])
+        self._sync_state()
+        return self._black_numbered_cells > 0
     
     def _contains_contradiction(self):
         """
@@ -163,19 +432,18 @@ class Kurodoko(object):
             return False
     
     def count_cells_in_each_direction(self, row, col):
-        center = (row,col)
-        n_north = row 
-        n_south = self.grid_size[0] - row - 1
-        n_west = col
-        n_east = self.grid_size[1] - col - 1
-        n_visible = n_north + n_south + n_west + n_east
-        assert n_visible == np.sum(self.grid_size) - 2
-        return {
-            'north':n_north,
-            'south':n_south,
-            'west':n_west,
-            'east':n_east
-        }
+        idx = self.topology.index(row, col)
+        return dict([(direction, len(self.topology.rays[direction][idx])) for direction in ['north','south','west','east']])
+    
+    def visibility(self):
+        """
+        Returns the visibility engine of this grid's backend (VisibilityEngine
+        or BitboardEngine) for the current shades. It is rebuilt in
+        one batched pass after direct writes, and patched row- and
+        column-wise by assign().
+        """
+        self._sync_state()
+        return self._visibility_engine
     
     def count_visible_cells_in_direction(self, row, col, direction, thresh):
         """
@@ -191,59 +459,16 @@ class Kurodoko(object):
         """
         assert thresh in [0, 1]
         assert direction in ['north','south','east','west']
-        if self.shades[row,col] < thresh:
-            return 0
-        n_visible = 0
-        if direction == 'north':
-            for i in range(row):
-                shade = self.shades[row-i-1, col]
-                if shade >= thresh:
-                    n_visible += 1
-                else:
-                    return n_visible
-        elif direction == 'south':
-            for i in range(self.height-row-1):
-                shade = self.shades[row+i+1, col]
-                if shade >= thresh:
-                    n_visible += 1
-                else:
-                    return n_visible
-        elif direction == 'west':
-            for i in range(col):
-                shade = self.shades[row, col-i-1]
-                if shade >= thresh:
-                    n_visible += 1
-                else:
-                    return n_visible
-        elif direction == 'east':
-            for i in range(self.width-col-1):
-                shade = self.shades[row, col+i+1]
-                if shade >= thresh:
-                    n_visible += 1
-                else:
-                    return n_visible
-        return n_visible
+        return self.visibility().count(row, col, direction, thresh)
     
     def count_visible_cells_from(self, row, col, thresh):
         assert thresh in [0,1]
-        n_in_dir = sum([self.count_visible_cells_in_direction(
-            row, col, direction, thresh=thresh
-            ) for direction in ['south','north','east','west']
-        ])
-        return n_in_dir
+        return self.visibility().total(row, col, thresh)
     
     def coords_of_visible_cells_in_direction(self, row, col, direction, thresh):
         assert direction in ['north','south','east','west']
         n_cells_in_dir = self.count_visible_cells_in_direction(row, col, direction, thresh)
-        if direction == 'north':
-            coords = [(row-i-1,col) for i in range(n_cells_in_dir)]
-        elif direction == 'south':
-            coords = [(row+i+1,col) for i in range(n_cells_in_dir)]
-        elif direction == 'east':
-            coords = [(row,col+i+1) for i in range(n_cells_in_dir)]
-        elif direction == 'west':
-            coords = [(row,col-i-1) for i in range(n_cells_in_dir)]
-        return coords
+        return self.topology.rays[direction][self.topology.index(row, col)][:n_cells_in_dir]
     
     def coords_of_visible_cells_from(self, row, col, thresh):
         coords = []
@@ -259,14 +484,7 @@ class Kurodoko(object):
         if n_extra == 0:
             return ()
         else:
-            if direction == 'north':
-                return (row - n_white_cells_visible - 1, col)
-            elif direction == 'south':
-                return (row + n_white_cells_visible + 1, col)
-            elif direction == 'east':
-                return (row, col + n_white_cells_visible + 1)
-            elif direction == 'west':
-                return (row, col - n_white_cells_visible - 1)
+            return self.topology.rays[direction][self.topology.index(row, col)][n_white_cells_visible]
     
     def nearest_blank_cells_from(self, row, col):
         coords = [self.nearest_blank_cell_in_direction(row, col, direction) for direction in ['north', 'south', 'east', 'west']]
@@ -296,31 +514,14 @@ class Kurodoko(object):
         or by white or blank cells if thresh==0.
         """
         assert thresh in [0,1]
-        cells_visited = set([(row,col)])
-        cells_exhausted = set()
-        while set(cells_exhausted) != set(cells_visited):
-            # Pick a cell from the visited set that is not exhausted
-            next_options = list(cells_visited.difference(cells_exhausted))
-            assert len(next_options) > 0
-            current_cell = next_options[0]
-            current_row, current_col = current_cell
-            # Get all neighbours
-            current_neighbours = self.get_open_neighbours(current_row, current_col, thresh)
-            # Add these to the visited set, and add current_cell to exhausted set.
-            cells_visited = cells_visited.union(current_neighbours)
-            cells_exhausted.add(current_cell)
-        return cells_visited
-        # cell_set =
-        # for coord in cell_
-        # Perform depth first search on cells
+        reached = reachable_cells(self.shades >= thresh, row * self.width + col)
+        return set([divmod(idx, self.width) for idx in reached])
     
     def get_neighbours(self, row, col):
-        neighbours = [(row-1,col), (row+1,col), (row,col-1), (row,col+1)]
-        return list(set.intersection(set(neighbours), set(self.valid_coords)))
+        return self.topology.neighbours[self.topology.index(row, col)]
     
     def get_diagonal_neighbours(self, row, col):
-        neighbours = [(row-1,col-1), (row+1,col-1), (row-1,col+1), (row+1,col+1)]
-        return list(set.intersection(set(neighbours), set(self.valid_coords)))
+        return self.topology.diagonal_neighbours[self.topology.index(row, col)]
     
     def get_open_neighbours(self, row, col, thresh):
         viable_neighbours = self.get_neighbours(row, col)
@@ -328,7 +529,7 @@ class Kurodoko(object):
         return open_neighbours
     
     def get_all_white_cells(self, thresh):
-        all_white_cells = set([coord for coord in self.valid_coords if self.shades[coord]>=thresh])
+        all_white_cells = set(map(tuple, np.argwhere(self.shades >= thresh).tolist()))
         return all_white_cells
         
     def number_is_valid_at(self, row, col):
@@ -376,7 +577,7 @@ class Kurodoko(object):
         if self.cell_sees_max_possible(row, col, 0):
             ensure_white_coords = self.coords_of_visible_cells_from(row, col, 0)
             for coord in ensure_white_coords:
-                self.shades[coord] = 1
+                self.assign(coord, 1)
     
     def deduce_number_already_satisfied(self, row, col):
         if self.count_visible_cells_from(row, col, 1) + 1 == self.numbers[row, col]:
@@ -384,41 +585,194 @@ class Kurodoko(object):
             # So, now get nearest visible BLANK cells and make them BLACK.
             coords = self.nearest_blank_cells_from(row, col)
             for coord in coords:
-                self.set_shade_black(*coord)
+                if -1 in self.neighbouring_shades(*coord):
+                    # Forced next to another black cell: leave the
+                    # contradiction for _contains_contradiction to report.
+                    self.assign(coord, -1)
+                else:
+                    self.set_shade_black(*coord)
+    
+    def ray_count_masks(self, row, col):
+        """
+        For each direction, the bitmask of how many cells the clue at
+        (row, col) could still see that way (bit k set if count k is
+        possible): the first k cells must not be black, and the k-th cell
+        must be the grid edge, a black cell, or a blank cell that may
+        still be blackened.
+        """
+        idx = self.topology.index(row, col)
+        engine = self.visibility()
+        cells = self._cells
+        masks = []
+        for direction in DIRECTIONS:
+            mask = 0
+            ray = self.topology.ray_indices[direction][idx]
+            for k, ray_idx in enumerate(ray):
+                shade = cells[ray_idx]
+                if shade == -1:
+                    mask |= 1 << k
+                    break
+                if shade == 0 and engine.black_neighbours(self._shades_view, *divmod(ray_idx, self.width)) == 0:
+                    mask |= 1 << k
+            else:
+                mask |= 1 << len(ray)
+            masks.append(mask)
+        return tuple(masks)
+    
+    def deduce_clue_splits(self, row, col):
+        """
+        Considers every way the clue at (row, col) could split its visible
+        cells between the four directions (see clue_splits). Cells seen in
+        every remaining split are made white, and if a direction's count is
+        the same in all of them, its stopper is made black.
+        """
+        idx = self.topology.index(row, col)
+        achievable = achievable_counts(int(self.numbers[row, col]) - 1, self.ray_count_masks(row, col))
+        if not any(achievable):
+            # No split fits: leave it to the contradiction checks.
+            return
+        for direction, mask in zip(DIRECTIONS, achievable):
+            ray = self.topology.rays[direction][idx]
+            least = lowest_count(mask)
+            for coord in ray[:least]:
+                self.assign(coord, 1)
+            if mask == 1 << least and least < len(ray) and self.shades[ray[least]] == 0:
+                if -1 in self.neighbouring_shades(*ray[least]):
+                    self.assign(ray[least], -1)
+                else:
+                    self.set_shade_black(*ray[least])
+    
+    def open_cell_analysis(self):
+        """
+        Returns the CutAnalysis of the white-or-blank cells. It only depends
+        on which cells are black, so one analysis serves a whole sweep of
+        deduce_dont_split_grid until a cell is blackened. It is also reused
+        once a probe's blackening is rolled back, since the black cells are
+        the same again.
+        """
+        self._sync_state()
+        if self._cut_analysis_version != self._black_version:
+            black = (self._cells == -1).tobytes()
+            if black != self._cut_analysis_black:
+                self._cut_analysis = CutAnalysis(self._shades_view >= 0)
+                self._cut_analysis_black = black
+            self._cut_analysis_version = self._black_version
+        return self._cut_analysis
     
     def cell_cannot_be_black(self, row, col):
-        fake_grid = self.clone()
-        if -1 in fake_grid.neighbouring_shades(row, col):
+        if -1 in self.neighbouring_shades(row, col):
             return True
-        else:
-            fake_grid.set_shade_black(row, col)
-            # If any regions are now cut off, then cell cannot be black; return True.
-            return fake_grid._any_regions_cut_off(0)
+        assert self.shades[row, col] <= 0
+        analysis = self.open_cell_analysis()
+        if self.shades[row, col] == -1:
+            return analysis.n_components > 1
+        # If any regions would be cut off, then cell cannot be black; return True.
+        return analysis.removal_disconnects(row * self.width + col)
     
     def deduce_dont_split_grid(self, row, col):
         if self.shades[row,col] == 0 and self.cell_cannot_be_black(row, col):
-            self.shades[row, col] = 1
+            self.assign((row, col), 1)
 
     def solve_grid_with_deductions(self):
+        """
+        Applies the direct deductions until nothing changes. Each iteration
+        is equivalent to sweeping every cell, but only cells on the worklist
+        are visited; rule_firings counts the rule evaluations made.
+        """
         prev_grid_state = self.shades[:].copy()
         state_changed = True
         self.solving_iterations = 0
-        while state_changed and (self.solving_iterations < 1000):
-            for coord in self.valid_coords:
-                if self.numbers[coord] > 0:
-                    self.deduce_cell_maxes_visible_space(*coord)
-                    self.deduce_number_already_satisfied(*coord)
-                if self.shades[coord] == 0:
-                    self.deduce_dont_split_grid(*coord)
-            next_grid_state = self.shades[:]
-            if np.all(prev_grid_state == next_grid_state):
-                state_changed = False
-            else:
-                prev_grid_state = next_grid_state.copy()
-            self.solving_iterations += 1
+        worklist = self._start_worklist()
+        try:
+            clue_cells = set(np.flatnonzero(self.numbers.ravel() > 0).tolist())
+            while state_changed and (self.solving_iterations < 1000):
+                self._run_deduction_pass(worklist, clue_cells)
+                next_grid_state = self.shades[:]
+                if np.all(prev_grid_state == next_grid_state):
+                    state_changed = False
+                else:
+                    prev_grid_state = next_grid_state.copy()
+                self.solving_iterations += 1
+        finally:
+            self._finish_worklist(worklist)
+    
+    def _start_worklist(self):
+        worklist = Worklist(self)
+        self._worklists.append(worklist)
+        return worklist
+    
+    def _finish_worklist(self, worklist):
+        self._worklists.remove(worklist)
+        self.rule_firings = worklist.rule_firings
+    
+    def _run_deduction_pass(self, worklist, clue_cells, clue_splits=False):
+        """
+        One sweep of the direct deductions over the cells on the worklist:
+        the clue rules for dirty cells in clue_cells (including
+        deduce_clue_splits if clue_splits is set), and
+        deduce_dont_split_grid for blank cells.
+        """
+        worklist.start_pass()
+        idx = worklist.pop()
+        while idx is not None:
+            if self.budget is not None:
+                self.budget.check()
+            row, col = divmod(idx, self.width)
+            if idx in clue_cells and worklist.take_clue(idx):
+                self.deduce_cell_maxes_visible_space(row, col)
+                self.deduce_number_already_satisfied(row, col)
+                worklist.rule_firings += 2
+                if clue_splits:
+                    self.deduce_clue_splits(row, col)
+                    worklist.rule_firings += 1
+            if self._cells[idx] == 0:
+                self.deduce_dont_split_grid(row, col)
+                worklist.rule_firings += 1
+            idx = worklist.pop()
     
     def clone(self):
-        return deepcopy(self)
+        """
+        Copies the board: its shades, numbers, trail and counters. The
+        cached solving state derived from them is shared with the original
+        until either grid changes a shade, which first gives it its own
+        copy (see _unshare_state()). The topology, the last CutAnalysis
+        (which is never modified) and the transposition table are shared
+        for good.
+        """
+        other = Kurodoko.__new__(self.__class__)
+        other.grid_size = self.grid_size
+        other.height = self.height
+        other.width = self.width
+        other.topology = self.topology
+        other.valid_coords = self.valid_coords
+        other.backend = self.backend
+        other._cache_status = CacheStatus()
+        other.shades = self._shades_view
+        other.numbers = self._numbers
+        other._cache_status.stale = self._cache_status.stale
+        other._state_shared = self._state_shared = not self._cache_status.stale
+        other._visibility_engine = self._visibility_engine
+        other._adjacent_black_pairs = self._adjacent_black_pairs
+        other._black_numbered_cells = self._black_numbered_cells
+        other._clues_seeing_wrong_number = self._clues_seeing_wrong_number
+        other._black_version = self._black_version
+        other._cut_analysis = self._cut_analysis
+        other._cut_analysis_version = self._cut_analysis_version
+        other._cut_analysis_black = self._cut_analysis_black
+        other._spanning_tree = self._spanning_tree
+        other._disconnected_version = self._disconnected_version
+        other._trail = list(self._trail)
+        other._trail_marks = list(self._trail_marks)
+        other.reasonings = list(self.reasonings)
+        other._worklists = []
+        other._board_hash = self._board_hash
+        other.transposition_table = self.transposition_table
+        other.solving_iterations = self.solving_iterations
+        other.rule_firings = self.rule_firings
+        other.search_nodes = self.search_nodes
+        other.stats = self.stats
+        other.budget = self.budget
+        return other
     
     def get_cant_be_black_candidates(self):
         """
@@ -442,16 +796,35 @@ class Kurodoko(object):
         you could test with a bit more look-ahead, but then you would
         need to test whether the cell had a number in it.
         """
-        fake_grid = self.clone()
-        fake_grid.shades[(row, col)] = -1
-        return fake_grid._contains_contradiction()
+        return self._assignment_contradicts((row, col), -1)
     
     def check_must_not_be_white(self, row, col):
-        fake_grid = self.clone()
-        fake_grid.shades[(row, col)] = 1
-        return fake_grid._contains_contradiction()
+        return self._assignment_contradicts((row, col), 1)
+    
+    def _assignment_contradicts(self, coord, shade):
+        """
+        Tentatively assigns shade to coord, checks for a contradiction and
+        rolls the assignment back again. Charged to self.budget as a probe.
+        """
+        if self.budget is not None:
+            self.budget.spend_probe()
+        self.checkpoint()
+        try:
+            self.assign(coord, shade)
+            return self._contains_contradiction()
+        finally:
+            self.rollback()
+    
+    def board_key(self):
+        """
+        Key identifying this board: a puzzle id derived from the numbers,
+        and the Zobrist hash of the shades.
+        """
+        self._sync_state()
+        puzzle_id = hash((self.grid_size, self._numbers.tobytes()))
+        return puzzle_id, self._board_hash
     
-    def solve_grid_with_deductions_and_single_conjectures(self, direct=True, single=True, branched=False):
+    def solve_grid_with_deductions_and_single_conjectures(self, direct=True, single=True, branched=False, executor=None, clue_splits=False, lookahead=None):
         """
         Attempts to fill out grid by pursuing:
         - direct detections (e.g., if this cell already sees enough white cells, next blank cells must be black)
@@ -462,40 +835,83 @@ class Kurodoko(object):
         ...  1 if it completely solves the grid
         ... -1 if it encounters a contradiction while solving
         ...  0 if it can no longer make any new deductions, but has not solved the grid.
+        
+        If an executor (e.g. a ProcessPoolExecutor) is given, branched
+        conjectures are evaluated speculatively in its workers; see
+        BranchSpeculation. lookahead is how many candidates it keeps in
+        flight (default: os.cpu_count()). The deductions made are the same
+        as without it.
+        
+        If clue_splits is set, every clue also runs deduce_clue_splits
+        among the direct deductions. This finds more, so it is off by
+        default to keep the solving_iterations of the other rules stable.
+        
+        If self.transposition_table is set, solves without branched
+        conjectures are memoized in it: a board seen before jumps straight
+        to the fixpoint (and solving_iterations) recorded the first time.
         """
+        table = self.transposition_table
+        if table is None or branched:
+            return self._solve_with_conjectures(branched, executor, clue_splits, lookahead)
+        key = self.board_key() + (clue_splits,)
+        start = self._cells.tobytes()
+        entry = table.lookup(key, start)
+        if entry is not None:
+            outcome, cells, self.solving_iterations, self.rule_firings = entry
+            self.adopt_shades(np.frombuffer(cells, dtype=np.int8))
+            return outcome
+        outcome = self._solve_with_conjectures(branched, executor, clue_splits, lookahead)
+        table.store(key, start, (outcome, self._cells.tobytes(), self.solving_iterations, self.rule_firings))
+        return outcome
+    
+    def _solve_with_conjectures(self, branched, executor, clue_splits, lookahead=None):
         prev_grid_state = self.shades[:].copy()
         state_changed = True
         self.solving_iterations = 0
-        while state_changed and (self.solving_iterations < 1000):
-            for coord in self.blank_cells():
-                if self.numbers[coord] > 0:
-                    self.deduce_cell_maxes_visible_space(*coord)
-                    self.deduce_number_already_satisfied(*coord)
-                if self.shades[coord] == 0:
-                    self.deduce_dont_split_grid(*coord)
-            for coord in self.get_cant_be_black_candidates():
-                if self.check_must_not_be_black(*coord):
-                    self.shades[coord] = 1
-                    if self._contains_contradiction():
-                        return -1
-            for coord in self.get_cant_be_white_candidates():
-                if self.check_must_not_be_white(*coord):
-                    self.set_shade_black(*coord)
-                    if self._contains_contradiction():
-                        return -1
-            if branched:
-                for coord in self.get_cant_be_black_candidates() + self.get_cant_be_white_candidates():
-                    if self.shades[coord] == 0:
-                        still_viable, reason = self.make_branched_conjecture(coord)
-                        self.reasonings += [reason]
-                        if not still_viable:
+        worklist = self._start_worklist()
+        try:
+            while state_changed and (self.solving_iterations < 1000):
+                # Direct deductions, over the cells that were blank when the
+                # pass started.
+                clue_cells = set(np.flatnonzero((self.numbers.ravel() > 0) & (self._cells == 0)).tolist())
+                if clue_splits:
+                    clue_cells = set(np.flatnonzero(self.numbers.ravel() > 0).tolist())
+                self._run_deduction_pass(worklist, clue_cells, clue_splits)
+                for coord in self.get_cant_be_black_candidates():
+                    if self.check_must_not_be_black(*coord):
+                        self.assign(coord, 1)
+                        if self._contains_contradiction():
                             return -1
-            next_grid_state = self.shades[:]
-            if np.all(prev_grid_state == next_grid_state):
-                state_changed = False
-            else:
-                prev_grid_state = next_grid_state.copy()
-            self.solving_iterations += 1
+                for coord in self.get_cant_be_white_candidates():
+                    if self.check_must_not_be_white(*coord):
+                        if self.shades[coord] != 0 or -1 in self.neighbouring_shades(*coord):
+                            # It must be black, but cannot be.
+                            return -1
+                        self.set_shade_black(*coord)
+                        if self._contains_contradiction():
+                            return -1
+                if branched:
+                    candidates = self.get_cant_be_black_candidates() + self.get_cant_be_white_candidates()
+                    speculation = None if executor is None else BranchSpeculation(self, candidates, executor, lookahead)
+                    try:
+                        for i, coord in enumerate(candidates):
+                            if self.shades[coord] == 0:
+                                outcomes = None if speculation is None else speculation.outcomes(i)
+                                still_viable, reason = self.make_branched_conjecture(coord, outcomes)
+                                self.reasonings += [reason]
+                                if not still_viable:
+                                    return -1
+                    finally:
+                        if speculation is not None:
+                            speculation.close()
+                next_grid_state = self.shades[:]
+                if np.all(prev_grid_state == next_grid_state):
+                    state_changed = False
+                else:
+                    prev_grid_state = next_grid_state.copy()
+                self.solving_iterations += 1
+        finally:
+            self._finish_worklist(worklist)
         if self._is_solved_and_valid():
             return 1
         elif self._contains_contradiction():
@@ -503,29 +919,304 @@ class Kurodoko(object):
         else:
             return 0
     
-    def make_branched_conjecture(self, coord):
+    def make_branched_conjecture(self, coord, outcomes=None):
         # Must be pivoting on a blank cell:
         assert self.shades[coord] == 0
-        outcome_black, outcome_white = get_x_y_outcomes(self, coord)
+        if outcomes is None:
+            outcomes = get_x_y_outcomes(self, coord)
+        outcome_black, outcome_white = outcomes
         action, cell_value = interpret_x_y_outcomes(outcome_black, outcome_white)
         if action == "make_clear_deduction":
-            self.shades[coord] = cell_value
+            self.assign(coord, cell_value)
             self.solve_grid_with_deductions_and_single_conjectures()
             return True, action
         elif action in ["unsolvable_grid", "two_solutions_exist"]:
             return False, action
         elif action in ["no_clear_conclusion"]:
             return True, action
+    
+    def solve(self, strategy="conjectures", heuristic="most_constrained_clue", executor=None, profile=False, budget=None, lookahead=None):
+        """
+        Solves the grid with one of these strategies:
+        - "deductions": direct deductions only
+        - "conjectures": direct deductions and single conjectures
+        - "branched": the above plus branched conjectures, evaluated in
+          parallel if an executor is given, with lookahead candidates in
+          flight (see BranchSpeculation)
+        - "search": depth-first backtracking on top of the conjectures
+          fixpoint (with deduce_clue_splits), branching on the cell picked
+          by heuristic (one of BRANCHING_HEURISTICS). The number of search
+          nodes explored is kept in self.search_nodes.
+        - "sat": encodes the grid as CNF and solves it with the built-in
+          CDCL solver; see kurodoko_sat.
+        
+        Returns 1 if solved, -1 on a contradiction and 0 if stuck, like
+        solve_grid_with_deductions_and_single_conjectures. A search never
+        gets stuck: it returns 1, leaving the grid holding the first solution
+        found, or -1 if there is no solution. Neither does "sat".
+        
+        With profile=True, returns (outcome, stats) instead, where stats is
+        a SolverStats of calls, timings and cells decided per rule and
+        helper (see PROFILED_METHODS). Work done in an executor's worker
+        processes is not included.
+        
+        If a budget.Budget is given, the solve stops once it runs out and
+        returns budget.TIMEOUT. The grid then holds every deduction made so
+        far (never a guess), and the budget holds the work done; see
+        Budget.report(). Probes run in an executor's workers are not
+        charged, but the deadline still holds between them.
+        """
+        if budget is not None:
+            self.budget = budget
+            budget.start()
+        try:
+            if not profile:
+                return self._solve(strategy, heuristic, executor, lookahead)
+            base_class = self.__class__
+            self.stats = SolverStats()
+            self.__class__ = InstrumentedKurodoko
+            start = time.perf_counter()
+            try:
+                outcome = self._solve(strategy, heuristic, executor, lookahead)
+            finally:
+                self.stats.total_seconds = time.perf_counter() - start
+                self.__class__ = base_class
+            return outcome, self.stats
+        finally:
+            if budget is not None:
+                budget.stop()
+                self.budget = None
+    
+    def _solve(self, strategy, heuristic, executor, lookahead=None):
+        try:
+            return self._run_strategy(strategy, heuristic, executor, lookahead)
+        except BudgetExceeded:
+            return TIMEOUT
+    
+    def _run_strategy(self, strategy, heuristic, executor, lookahead=None):
+        if strategy == "deductions":
+            self.solve_grid_with_deductions()
+            return self.solution_status()
+        elif strategy == "conjectures":
+            return self.solve_grid_with_deductions_and_single_conjectures()
+        elif strategy == "branched":
+            return self.solve_grid_with_deductions_and_single_conjectures(branched=True, executor=executor, lookahead=lookahead)
+        elif strategy == "search":
+            solutions = self.search_solutions(heuristic=heuristic, limit=1)
+            if not solutions:
+                return -1
+            self.adopt_shades(solutions[0])
+            return 1
+        elif strategy == "sat":
+            return solve_with_sat(self, budget=self.budget)
+        else:
+            raise ValueError("Unknown strategy: {0}".format(strategy))
+    
+    def solution_status(self):
+        if self._is_solved_and_valid():
+            return 1
+        elif self._contains_contradiction():
+            return -1
+        else:
+            return 0
+    
+    def is_valid_solution(self):
+        """
+        A filled-out grid is a solution if it breaks no rule. (Once there
+        are no blank cells, _contains_contradiction checks every rule.)
+        """
+        return self._is_filled_out() and not self._contains_contradiction()
+    
+    def to_state(self):
+        """
+        Compact, picklable snapshot of the board for sending to worker
+        processes: grid size, backend, and the raw numbers and shades bytes.
+        """
+        return (self.grid_size, self.backend, self._numbers.tobytes(), self._cells.tobytes())
+    
+    def adopt_shades(self, shades):
+        """
+        Assigns every cell whose shade differs from the given array.
+        """
+        for idx in np.flatnonzero(self._cells != shades.ravel()).tolist():
+            self.assign(divmod(idx, self.width), shades.flat[idx])
+    
+    def search_solutions(self, heuristic="most_constrained_clue", limit=1):
+        """
+        Depth-first backtracking search. At every node the grid is first
+        propagated to its conjectures fixpoint; then the cell picked by
+        heuristic is tried black and then white. Stops once limit solutions
+        have been found, and returns them as a list of shade arrays.
+        
+        The grid is left at the root fixpoint, which only holds deductions.
+        """
+        choose_cell = BRANCHING_HEURISTICS[heuristic]
+        self.search_nodes = 0
+        solutions = []
+        self._search_node(choose_cell, limit, solutions)
+        return solutions
+    
+    def count_solutions(self, limit=2, heuristic="most_constrained_clue"):
+        """
+        Counts the solutions of the grid, stopping as soon as limit of them
+        have been found, so the default answers "is the solution unique?"
+        as cheaply as possible. Returns (count, witnesses), where witnesses
+        is the list of solutions found as shade arrays. The grid itself is
+        left as it was.
+        """
+        self.checkpoint()
+        try:
+            solutions = self.search_solutions(heuristic=heuristic, limit=limit)
+        finally:
+            self.rollback()
+        return len(solutions), solutions
+    
+    def has_unique_solution(self):
+        return self.count_solutions(limit=2)[0] == 1
+    
+    def _search_node(self, choose_cell, limit, solutions):
+        self.search_nodes += 1
+        if self.budget is not None:
+            self.budget.spend_node()
+        if self.solve_grid_with_deductions_and_single_conjectures(clue_splits=True) == -1:
+            return
+        if self._is_filled_out():
+            if self.is_valid_solution():
+                solutions.append(self.shades.copy())
+            return
+        coord = choose_cell(self)
+        for shade in [-1, 1]:
+            self.checkpoint()
+            try:
+                if shade == -1:
+                    if -1 in self.neighbouring_shades(*coord):
+                        continue
+                    self.set_shade_black(*coord)
+                else:
+                    self.assign(coord, 1)
+                if not self._contains_contradiction():
+                    self._search_node(choose_cell, limit, solutions)
+            finally:
+                self.rollback()
+            if len(solutions) >= limit:
+                return
+
+# Methods timed in a profiled solve. Rules are credited with the cells they
+# decide, probes with the cells decided because they succeeded.
+PROFILED_METHODS = {
+    'rules': [
+        'deduce_cell_maxes_visible_space', 'deduce_number_already_satisfied',
+        'deduce_clue_splits', 'deduce_dont_split_grid', 'make_branched_conjecture',
+    ],
+    'probes': ['check_must_not_be_black', 'check_must_not_be_white'],
+    'helpers': [
+        'solve_grid_with_deductions_and_single_conjectures', '_run_deduction_pass',
+        'clone', '_contains_contradiction', 'open_cell_analysis',
+        'get_cant_be_black_candidates', 'get_cant_be_white_candidates',
+    ],
+}
+
+InstrumentedKurodoko = make_instrumented_class(Kurodoko, **PROFILED_METHODS)
 
-def get_x_y_outcomes(grid, candidate):
-    grid_x = grid.clone()
-    grid_y = grid.clone()
-    grid_x.shades[candidate] = -1
-    grid_y.shades[candidate] = 1
-    outcome_x = grid_x.solve_grid_with_deductions_and_single_conjectures()
-    outcome_y = grid_y.solve_grid_with_deductions_and_single_conjectures()
+def get_x_y_outcomes(grid, candidate, executor=None):
+    if executor is not None:
+        futures = submit_x_y_outcomes(executor, grid.to_state(), candidate)
+        return tuple([future.result() for future in futures])
+    outcome_x = get_hypothesis_outcome(grid, candidate, -1)
+    outcome_y = get_hypothesis_outcome(grid, candidate, 1)
     return outcome_x, outcome_y
 
+def submit_x_y_outcomes(executor, state, candidate):
+    return [executor.submit(get_hypothesis_outcome_from_state, state, candidate, shade) for shade in [-1, 1]]
+
+def get_hypothesis_outcome_from_state(state, candidate, shade):
+    # Runs in a worker process.
+    return get_hypothesis_outcome(make_kurodoko_from_state(state), candidate, shade)
+
+class BranchSpeculation(object):
+    """
+    Evaluates the branched conjectures of upcoming candidates ahead of time
+    in an executor, both branches of each candidate at once.
+    
+    The serial solver visits candidates in order, and each outcome depends
+    only on the board state it was computed from. So outcomes are only used
+    if the board is unchanged since they were submitted; as soon as a
+    deduction changes it, outstanding work is dropped and resubmitted from
+    the new state. The result is exactly the serial sequence of deductions.
+    
+    Up to lookahead candidates are in flight at once. The default,
+    os.cpu_count(), gives each core of a full-size pool one candidate.
+    Dropped work that a worker has already started cannot be stopped: it
+    counts against lookahead until it finishes, and close() waits for it,
+    so a speculation can overrun a budget's deadline by about one probe.
+    """
+    
+    def __init__(self, grid, candidates, executor, lookahead=None):
+        self.grid = grid
+        self.candidates = candidates
+        self.executor = executor
+        if lookahead is None:
+            lookahead = os.cpu_count() or 1
+        self.lookahead = lookahead
+        self.state = None
+        self.futures = {}
+        # Dropped futures that had already started, and so could not be
+        # cancelled; see _drop_futures().
+        self.running = []
+    
+    def outcomes(self, i):
+        state = self.grid.to_state()
+        if state != self.state:
+            self._drop_futures()
+            self.state = state
+        if i not in self.futures:
+            self._submit_from(i)
+        return tuple([future.result() for future in self.futures.pop(i)])
+    
+    def close(self):
+        """
+        Drops the outstanding work and waits for whatever of it had already
+        started, so that the executor is free again once this returns.
+        """
+        self._drop_futures()
+        wait(self.running)
+        self.running = []
+    
+    def _drop_futures(self):
+        # A worker cannot be stopped once it has picked up a probe. Such
+        # probes keep counting against lookahead until they finish, so the
+        # pool is never handed more than lookahead candidates' worth of work.
+        for futures in self.futures.values():
+            self.running += [future for future in futures if not future.cancel()]
+        self.futures = {}
+    
+    def _in_flight(self):
+        self.running = [future for future in self.running if not future.done()]
+        return len(self.futures) + (len(self.running) + 1) // 2
+    
+    def _submit_from(self, i):
+        for j in range(i, len(self.candidates)):
+            if j > i and self._in_flight() >= self.lookahead:
+                break
+            if j not in self.futures and self.grid.shades[self.candidates[j]] == 0:
+                self.futures[j] = submit_x_y_outcomes(self.executor, self.state, self.candidates[j])
+
+def get_hypothesis_outcome(grid, candidate, shade):
+    """
+    Solves the grid as if candidate had the given shade, then restores the
+    grid (including its solving_iterations and rule_firings) to how it was.
+    """
+    if grid.budget is not None:
+        grid.budget.spend_probe()
+    solving_iterations, rule_firings = grid.solving_iterations, grid.rule_firings
+    grid.checkpoint()
+    try:
+        grid.assign(candidate, shade)
+        return grid.solve_grid_with_deductions_and_single_conjectures()
+    finally:
+        grid.rollback()
+        grid.solving_iterations, grid.rule_firings = solving_iterations, rule_firings
+
 def interpret_x_y_outcomes(outcome_x, outcome_y):
     outcome_tuple = (outcome_x, outcome_y)
     if outcome_tuple in [(-1,0), (-1,1)]:
@@ -542,6 +1233,59 @@ def interpret_x_y_outcomes(outcome_x, outcome_y):
         # Cannot decide since we cannot rule out a (1,1) outcome.
         return "no_clear_conclusion", None
 
+def most_constrained_clue(grid):
+    """
+    Picks a nearest blank cell of the clue with the least room to spare,
+    i.e. the fewest blank cells it could still see beyond what it needs.
+    """
+    best_coord, best_slack = None, None
+    for coord in grid.numbered_cells():
+        nearest_blank_cells = grid.nearest_blank_cells_from(*coord)
+        if not nearest_blank_cells:
+            continue
+        slack = grid.count_visible_cells_from(*coord, 0) + 1 - grid.numbers[coord]
+        if best_slack is None or slack < best_slack:
+            best_coord, best_slack = nearest_blank_cells[0], slack
+    return best_coord if best_coord is not None else grid.blank_cells()[0]
+
+def first_cant_be_black_candidate(grid):
+    candidates = grid.get_cant_be_black_candidates()
+    return min(candidates) if candidates else grid.blank_cells()[0]
+
+def most_white_neighbours(grid):
+    return max(grid.blank_cells(), key=lambda coord: grid.neighbouring_shades(*coord).count(1))
+
+BRANCHING_HEURISTICS = {
+    "most_constrained_clue": most_constrained_clue,
+    "cant_be_black_candidates": first_cant_be_black_candidate,
+    "most_white_neighbours": most_white_neighbours,
+}
+
+def compare_heuristics(grid, heuristics=None):
+    """
+    Runs the search on a clone of grid with each heuristic, and returns a
+    dict of heuristic -> (outcome, search nodes, seconds).
+    """
+    if heuristics is None:
+        heuristics = sorted(BRANCHING_HEURISTICS)
+    results = {}
+    for heuristic in heuristics:
+        trial = grid.clone()
+        start = time.perf_counter()
+        outcome = trial.solve(strategy="search", heuristic=heuristic)
+        results[heuristic] = (outcome, trial.search_nodes, time.perf_counter() - start)
+    return results
+
+def make_kurodoko_from_state(state):
+    """
+    Rebuilds a Kurodoko from Kurodoko.to_state().
+    """
+    grid_size, backend, numbers, cells = state
+    grid = Kurodoko(grid_size, backend=backend)
+    grid.numbers = np.frombuffer(numbers, dtype=np.int16).reshape(grid_size)
+    grid.shades = np.frombuffer(cells, dtype=np.int8).reshape(grid_size)
+    return grid
+
 def make_kurodoko_from_file(filepath):
     with open(filepath) as textfile:
         text = textfile.readlines()
@@ -561,3 +1305,104 @@ def make_csv_from_kurodoko(grid, filepath):
         for i in range(grid.height):
             row_data = list(grid.numbers[i,:]) + list(grid.shades[i,:])
             grid_writer.writerow(row_data)
+
+def make_puzzle_csv_from_kurodoko(grid, filepath):
+    """
+    Writes the clues in the format read by make_kurodoko_from_file.
+    """
+    with open(filepath, mode='w') as gridfile:
+        grid_writer = csv.writer(gridfile)
+        for i in range(grid.height):
+            grid_writer.writerow([number if number > 0 else "" for number in grid.numbers[i,:].tolist()])
+
+# Streaming format: one puzzle per line, "<height>x<width> <clues>", with
+# the shades optionally appended as a third field. Clues are listed in
+# row-major order: a run of n blank cells is written as letters worth 1
+# (a) to 26 (z) each, a clue as its number, and '.' separates two clues
+# that follow each other directly. Trailing blanks are left out, so the
+# example grid is "7x7 2e7a3g4g5g6g7a11e8", and a grid without clues is
+# written as "." so that the field is never empty. Shades are one
+# character per cell, from SHADE_CHARACTERS. Blank lines and lines
+# starting with '#' are skipped.
+SHADE_CHARACTERS = {-1: 'x', 0: '-', 1: 'o'}
+
+def encode_clues(numbers):
+    tokens = []
+    gap = 0
+    follows_clue = False
+    for number in numbers.ravel().tolist():
+        if number == 0:
+            gap += 1
+            continue
+        while gap > 0:
+            tokens.append(chr(ord('a') + min(gap, 26) - 1))
+            gap -= min(gap, 26)
+            follows_clue = False
+        if follows_clue:
+            tokens.append('.')
+        tokens.append(str(number))
+        follows_clue = True
+    return "".join(tokens)
+
+def decode_clues(text, grid_size):
+    """
+    Returns the (row, col, number) clues of an encode_clues() string.
+    """
+    height, width = grid_size
+    clues = []
+    idx = 0
+    digits = ""
+    for character in text + ".":
+        if character.isdigit():
+            digits += character
+            continue
+        if digits:
+            clues.append(divmod(idx, width) + (int(digits),))
+            idx += 1
+            digits = ""
+        if 'a' <= character <= 'z':
+            idx += ord(character) - ord('a') + 1
+        elif character != '.':
+            raise ValueError("Unexpected character in clues: {0!r}".format(character))
+    if idx > height * width:
+        raise ValueError("Clues run past the end of a {0}x{1} grid".format(height, width))
+    return clues
+
+def make_kurodoko_from_line(line):
+    fields = line.split()
+    height, width = [int(side) for side in fields[0].split("x")]
+    grid = Kurodoko((height, width), set_numbers=decode_clues(fields[1] if len(fields) > 1 else "", (height, width)))
+    if len(fields) > 2:
+        characters = dict([(character, shade) for shade, character in SHADE_CHARACTERS.items()])
+        grid.shades = np.array([characters[character] for character in fields[2]], dtype=np.int8).reshape(height, width)
+    return grid
+
+def make_line_from_kurodoko(grid, include_shades=False):
+    fields = ["{0}x{1}".format(grid.height, grid.width), encode_clues(grid.numbers) or "."]
+    if include_shades:
+        fields.append("".join([SHADE_CHARACTERS[shade] for shade in grid.shades.ravel().tolist()]))
+    return " ".join(fields)
+
+def iter_kurodokos_from_file(filepath):
+    """
+    Yields the puzzles of a streaming-format file one at a time, so memory
+    use does not depend on the size of the file.
+    """
+    with open(filepath) as textfile:
+        for line in textfile:
+            line = line.strip()
+            if line and not line.startswith("#"):
+                yield make_kurodoko_from_line(line)
+
+def write_kurodokos_to_file(grids, filepath, include_shades=True, buffer_size=1 << 20):
+    """
+    Writes an iterable of grids in the streaming format, through a large
+    write buffer. grids is consumed lazily, so it can be a generator.
+    Returns the number of grids written.
+    """
+    count = 0
+    with open(filepath, mode='w', buffering=buffer_size) as textfile:
+        for grid in grids:
+            textfile.write(make_line_from_kurodoko(grid, include_shades) + "\n")
+            count += 1
+    return count
@@ -0,0 +1,81 @@
+import random
+
+import numpy as np
+
+from batch_kurodoko import *
+from generate_kurodoko import random_solution, puzzle_from_solution
+from solve_kurodoko import Kurodoko, make_kurodoko_from_file, write_kurodokos_to_file
+
+def random_puzzles(n_puzzles, side, seed=0):
+    rng = random.Random(seed)
+    return [puzzle_from_solution(random_solution((side, side), rng), rng, rng.choice([0.3, 0.6]))
+        for _ in range(n_puzzles)]
+
+def test_visible_totals_match_scalar():
+    grids = random_puzzles(5, 7)
+    for grid in grids:
+        grid.solve("deductions")
+    shades = np.stack([grid.shades for grid in grids])
+    for thresh in [0, 1]:
+        totals = visible_totals(shades, thresh)
+        for grid, grid_totals in zip(grids, totals):
+            for row, col in grid.valid_coords:
+                if grid.shades[row, col] >= thresh:
+                    assert grid_totals[row, col] == grid.count_visible_cells_from(row, col, thresh)
+
+def test_reached_from():
+    sources = np.array([[[0, 1, 0, 0, 0, 1]]], dtype=bool)
+    passable = np.array([[[1, 1, 1, 0, 1, 1]]], dtype=bool)
+    assert reached_from(sources, passable, 2, False).astype(int).tolist() == [[[0, 0, 1, 1, 0, 0]]]
+    assert reached_from(sources, passable, 2, True).astype(int).tolist() == [[[1, 0, 0, 1, 1, 0]]]
+
+def test_open_cells_connected():
+    open_cells = np.ones((3, 3, 3), dtype=bool)
+    open_cells[1, :, 1] = False
+    open_cells[2, 1, 1] = False
+    assert open_cells_connected(open_cells).tolist() == [True, False, True]
+    assert len(open_cells_connected(open_cells[:0])) == 0
+
+def test_batch_matches_scalar_deductions():
+    grids = random_puzzles(20, 7, seed=2)
+    batch = make_batch_from_kurodokos(grids)
+    statuses = batch.solve()
+    assert 0 < batch.passes < 20
+    assert set(statuses.tolist()) == {0, 1}
+    for i, grid in enumerate(grids):
+        # The scalar deductions also use connectivity, so they get at least
+        # as far as the batch.
+        grid.solve("deductions")
+        decided = batch.shades[i] != 0
+        assert np.array_equal(grid.shades[decided], batch.shades[i][decided])
+        if statuses[i] == 1:
+            assert batch.kurodoko(i).is_valid_solution()
+
+def test_batch_flags_contradictions():
+    grid = make_kurodoko_from_file("example_grid.csv")
+    grid.shades[0, 1] = -1
+    grid.shades[0, 2] = -1
+    batch = make_batch_from_kurodokos([grid, make_kurodoko_from_file("example_grid.csv")])
+    assert batch.solve().tolist() == [-1, 0]
+
+def test_batch_of_unsolvable_puzzles():
+    grids = [Kurodoko((3,3), set_numbers=[(1,1,3),(2,1,2)]) for _ in range(2)]
+    batch = make_batch_from_kurodokos(grids)
+    assert batch.solve().tolist() == [-1, -1]
+    assert solve_kurodokos(grids) == [-1, -1]
+
+def test_solve_kurodokos_matches_scalar():
+    grids = random_puzzles(30, 7) + random_puzzles(10, 9, seed=1)
+    scalar = [grid.clone() for grid in grids]
+    expected = [grid.solve("conjectures") for grid in scalar]
+    assert solve_kurodokos(grids, "conjectures", batch_size=16) == expected
+    for grid, reference in zip(grids, scalar):
+        if grid.solution_status() == 1:
+            assert np.array_equal(grid.shades, reference.shades)
+
+def test_main(tmp_path, capsys):
+    input_path = str(tmp_path / "puzzles.txt")
+    output_path = str(tmp_path / "solved.txt")
+    write_kurodokos_to_file([make_kurodoko_from_file("example_grid.csv")] * 2, input_path, include_shades=False)
+    assert main([input_path, "--output", output_path, "--strategy", "branched"]) == {1: 2}
+    assert all([grid.is_valid_solution() for grid in iter_kurodokos_from_file(output_path)])
@@ -0,0 +1,56 @@
+import os
+import shutil
+
+from batch_solve_kurodoko import *
+
+def make_puzzle_dir(tmp_path, n_puzzles):
+    puzzle_dir = tmp_path / "puzzles"
+    puzzle_dir.mkdir()
+    for i in range(n_puzzles):
+        shutil.copy("example_grid.csv", str(puzzle_dir / "grid_{0}.csv".format(i)))
+    return str(puzzle_dir)
+
+def test_find_puzzle_files(tmp_path):
+    puzzle_dir = make_puzzle_dir(tmp_path, 3)
+    assert len(find_puzzle_files(puzzle_dir)) == 3
+    assert find_puzzle_files(os.path.join(puzzle_dir, "grid_1*")) == [os.path.join(puzzle_dir, "grid_1.csv")]
+
+def test_solve_puzzle_files_in_parallel(tmp_path):
+    puzzle_dir = make_puzzle_dir(tmp_path, 4)
+    output_dir = str(tmp_path / "solved")
+    results = solve_puzzle_files(find_puzzle_files(puzzle_dir), output_dir, workers=2, chunksize=1)
+    assert [result['status'] for result in results] == [1, 1, 1, 1]
+    assert all([result['iterations'] > 0 for result in results])
+    assert sorted(os.listdir(output_dir)) == ["grid_{0}_solved.csv".format(i) for i in range(4)]
+
+def test_main(tmp_path, capsys):
+    puzzle_dir = make_puzzle_dir(tmp_path, 2)
+    results = main([puzzle_dir, "--workers", "1", "--strategy", "search"])
+    assert len(results) == 2
+    assert "Solved 2 puzzles" in capsys.readouterr().out
+
+def test_solve_puzzle_stream(tmp_path):
+    line = make_line_from_kurodoko(make_kurodoko_from_file("example_grid.csv"))
+    input_path = str(tmp_path / "puzzles.txt")
+    output_path = str(tmp_path / "solved.txt")
+    with open(input_path, "w") as textfile:
+        textfile.write("# three copies\n" + (line + "\n") * 3)
+    assert solve_puzzle_stream(input_path, output_path, workers=2, chunksize=1) == {1: 3}
+    with open(output_path) as textfile:
+        solved = [make_kurodoko_from_line(solved_line) for solved_line in textfile]
+    assert len(solved) == 3 and all([grid.is_valid_solution() for grid in solved])
+    assert main([input_path, "--output", output_path, "--workers", "1"]) == {1: 3}
+
+def test_solve_puzzle_archive(tmp_path):
+    input_path = str(tmp_path / "puzzles.kdb")
+    output_path = str(tmp_path / "solved.kdb")
+    write_archive([make_kurodoko_from_file("example_grid.csv")] * 5, input_path)
+    assert solve_puzzle_archive(input_path, output_path, workers=2, chunksize=2) == {1: 5}
+    solved = KurodokoArchive(output_path)
+    assert len(solved) == 5
+    assert all([grid.is_valid_solution() for grid in solved])
+
+def test_solve_puzzle_file_timeout():
+    result = solve_puzzle_file("example_grid.csv", seconds=0.0)
+    assert result['status'] == "timeout"
+    assert result['blank_cells'] > 0
@@ -0,0 +1,33 @@
+import json
+
+from benchmark_kurodoko import *
+
+def test_corpus_is_deterministic():
+    first = make_corpus(max_size=7)
+    second = make_corpus(max_size=7)
+    assert [name for name, grid in first] == ["example_grid", "wikipedia", "7x7-easy", "7x7-hard"]
+    for (_, grid), (_, again) in zip(first, second):
+        assert np.all(grid.numbers == again.numbers)
+
+def test_compare_results():
+    baseline = {'results': [
+        {'puzzle': 'a', 'target': 'conjectures', 'seconds': 1.0},
+        {'puzzle': 'b', 'target': 'conjectures', 'seconds': 1.0},
+    ]}
+    current = {'results': [
+        {'puzzle': 'a', 'target': 'conjectures', 'seconds': 1.1},
+        {'puzzle': 'b', 'target': 'conjectures', 'seconds': 1.5},
+        {'puzzle': 'c', 'target': 'conjectures', 'seconds': 9.0},
+    ]}
+    assert compare_results(baseline, current, threshold=0.2) == [('b', 'conjectures', 1.0, 1.5)]
+
+def test_run_and_compare(tmpdir):
+    baseline = str(tmpdir.join("baseline.json"))
+    grid = make_kurodoko_from_file("example_grid.csv")
+    results = benchmark_puzzle("example_grid", grid, repeat=1)
+    assert [result['target'] for result in results] == [
+        "deductions", "conjectures", "branched", "sat", "_contains_contradiction", "collect_contiguous_cells_from"]
+    assert results[2]['outcome'] == 1
+    with open(baseline, mode='w') as jsonfile:
+        json.dump({'results': results}, jsonfile)
+    assert main(["compare", baseline, baseline]) == 0
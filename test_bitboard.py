@@ -0,0 +1,46 @@
+from bitboard import *
+from visibility import VisibilityEngine
+from solve_kurodoko import Kurodoko
+
+def test_bit_helpers():
+    assert row_mask(np.array([True, False, True, True])) == 0b1101
+    assert trailing_ones(0b0111) == 3
+    assert trailing_ones(0) == 0
+    assert ones_below(0b0110, 3) == 2
+    assert ones_below(0b0111, 3) == 3
+    assert ones_below(0b0101, 3) == 1
+    assert ones_below(0b0011, 3) == 0
+    assert popcount(0b1011) == 3
+
+def test_bitboard_engine_matches_numpy_engine():
+    rng = np.random.RandomState(4)
+    for shape in [(1,1), (1,7), (6,1), (5,5), (8,13), (3,70)]:
+        for _ in range(10):
+            shades = rng.randint(-1, 2, size=shape)
+            bits = BitboardEngine(shades)
+            arrays = VisibilityEngine(shades)
+            assert np.all(bits.runs == arrays.runs)
+            assert bits.adjacent_black_pairs(shades) == arrays.adjacent_black_pairs(shades)
+            for row in range(shape[0]):
+                for col in range(shape[1]):
+                    assert bits.black_neighbours(shades, row, col) == arrays.black_neighbours(shades, row, col)
+            row, col = rng.randint(shape[0]), rng.randint(shape[1])
+            shades[row, col] = rng.randint(-1, 2)
+            bits.update(shades, row, col)
+            arrays.update(shades, row, col)
+            assert np.all(bits.runs == arrays.runs)
+            old_shade = shades[row, col]
+            shades[row, col] = rng.randint(-1, 2)
+            bits.update(shades, row, col, old_shade)
+            arrays.update(shades, row, col, old_shade)
+            assert np.all(bits.runs == arrays.runs)
+            assert np.all(arrays.totals == VisibilityEngine(shades).totals)
+
+def test_backend_selected_at_construction():
+    grid = Kurodoko((4,4), set_numbers=[(1,1,6), (2,3,2)], backend='bitboard')
+    assert isinstance(grid.visibility(), BitboardEngine)
+    assert grid.clone().backend == 'bitboard'
+    grid.set_shade_black(2,2)
+    assert grid.count_visible_cells_from(2,3,0) == 3
+    grid.shades[3,2] = -1
+    assert grid._any_black_cells_adjoin_each_other()
@@ -0,0 +1,74 @@
+import time
+
+import numpy as np
+import pytest
+
+from budget import *
+from generate_kurodoko import random_solution, puzzle_from_solution
+from solve_kurodoko import make_kurodoko_from_file
+
+def hard_puzzle():
+    import random
+    rng = random.Random("15x15-hard")
+    return puzzle_from_solution(random_solution((15, 15), rng), rng, 0.2)
+
+def assert_sound(partial, solved):
+    decided = partial.shades != 0
+    assert np.array_equal(partial.shades[decided], solved.shades[decided])
+
+def test_budget_limits():
+    budget = Budget(max_nodes=2, max_probes=1)
+    budget.start()
+    budget.spend_node()
+    budget.spend_node()
+    budget.spend_probe()
+    with pytest.raises(BudgetExceeded):
+        budget.spend_probe()
+    assert budget.exceeded == "probes"
+    budget = Budget(seconds=0.0, deadline=time.monotonic() + 10)
+    budget.start()
+    with pytest.raises(BudgetExceeded):
+        budget.check()
+    assert budget.report()['exceeded'] == "deadline"
+
+def test_probe_budget_returns_sound_partial_state():
+    solved = make_kurodoko_from_file("example_grid.csv")
+    assert solved.solve("branched") == 1
+    grid = make_kurodoko_from_file("example_grid.csv")
+    budget = Budget(max_probes=5)
+    assert grid.solve("branched", budget=budget) == TIMEOUT
+    assert budget.report()['exceeded'] == "probes"
+    assert budget.probes == 6
+    assert grid.budget is None
+    assert 0 < len(grid.blank_cells()) < 49
+    assert_sound(grid, solved)
+    assert grid.solve("branched") == 1
+
+def test_node_budget_stops_search():
+    grid = make_kurodoko_from_file("example_grid.csv")
+    solved = grid.clone()
+    solved.solve("search")
+    budget = Budget(max_nodes=0)
+    assert grid.solve("search", budget=budget) == TIMEOUT
+    assert budget.exceeded == "nodes"
+    assert_sound(grid, solved)
+    assert grid.solve("search", budget=Budget(max_nodes=100)) == 1
+
+def test_deadline():
+    grid = hard_puzzle()
+    budget = Budget(seconds=0.05)
+    start = time.monotonic()
+    outcome = grid.solve("branched", budget=budget)
+    assert outcome == TIMEOUT
+    assert time.monotonic() - start < 1.0
+    assert budget.elapsed >= 0.05
+    assert grid.solve("sat", budget=Budget(seconds=0.0)) == TIMEOUT
+
+def test_budget_with_profile():
+    grid = make_kurodoko_from_file("example_grid.csv")
+    outcome, stats = grid.solve("branched", profile=True, budget=Budget(max_probes=3))
+    assert outcome == TIMEOUT
+    assert stats.total_seconds > 0
+    # The probe cut short by the budget is counted too.
+    probes = stats.calls.get('check_must_not_be_black', 0) + stats.calls.get('check_must_not_be_white', 0)
+    assert probes == 4
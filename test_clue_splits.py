@@ -0,0 +1,16 @@
+from clue_splits import *
+
+def test_add_counts():
+    assert add_counts(0b1, 0b110) == 0b110
+    assert add_counts(0b11, 0b101) == 0b1111
+
+def test_achievable_counts():
+    # North/west see nothing; south sees 0 or 1; east sees 2 or 3.
+    assert achievable_counts(3, (0b1, 0b11, 0b1100, 0b1)) == (0b1, 0b11, 0b1100, 0b1)
+    # East can only see 2 or 3, so south must make up the rest.
+    assert achievable_counts(2, (0b1, 0b11, 0b1100, 0b1)) == (0b1, 0b1, 0b100, 0b1)
+    assert achievable_counts(9, (0b1, 0b11, 0b1100, 0b1)) == (0, 0, 0, 0)
+
+def test_lowest_count():
+    assert lowest_count(0b1100) == 2
+    assert lowest_count(0b1) == 0
@@ -0,0 +1,109 @@
+from connectivity import *
+from solve_kurodoko import Kurodoko
+import numpy as np
+
+def brute_force_disconnects(open_cells, idx):
+    # Close idx, then flood fill from any remaining open cell.
+    remaining = open_cells.copy().ravel()
+    remaining[idx] = False
+    height, width = open_cells.shape
+    cells = set(np.flatnonzero(remaining).tolist())
+    if not cells:
+        return False
+    seen = set([min(cells)])
+    frontier = [min(cells)]
+    while frontier:
+        cell = frontier.pop()
+        for neighbour in grid_neighbours(cell, height, width):
+            if neighbour in cells and neighbour not in seen:
+                seen.add(neighbour)
+                frontier.append(neighbour)
+    return seen != cells
+
+def test_grid_neighbours():
+    assert sorted(grid_neighbours(0, 2, 4)) == [1, 4]
+    assert sorted(grid_neighbours(6, 2, 4)) == [2, 5, 7]
+
+def test_articulation_points_of_a_path():
+    # . . .
+    # # # .
+    # . . .
+    open_cells = np.array([[1,1,1], [0,0,1], [1,1,1]], dtype=bool)
+    analysis = CutAnalysis(open_cells)
+    assert analysis.n_components == 1
+    assert analysis.articulation_points == set([1, 2, 5, 8, 7])
+
+def test_removal_disconnects_matches_flood_fill():
+    rng = np.random.RandomState(2)
+    for shape in [(1,5), (3,3), (4,6), (7,7)]:
+        for _ in range(30):
+            open_cells = rng.rand(*shape) < 0.75
+            analysis = CutAnalysis(open_cells)
+            for idx in np.flatnonzero(open_cells.ravel()):
+                assert analysis.removal_disconnects(idx) == brute_force_disconnects(open_cells, idx)
+
+def test_cell_cannot_be_black_matches_tentative_blackening():
+    rng = np.random.RandomState(3)
+    for _ in range(20):
+        grid = Kurodoko((6,6))
+        for coord in grid.valid_coords:
+            if rng.rand() < 0.2 and -1 not in grid.neighbouring_shades(*coord) and grid.shades[coord] == 0:
+                grid.set_shade_black(*coord)
+        for coord in grid.blank_cells():
+            if -1 in grid.neighbouring_shades(*coord):
+                continue
+            fake_grid = grid.clone()
+            fake_grid.set_shade_black(*coord)
+            assert grid.cell_cannot_be_black(*coord) == fake_grid._any_regions_cut_off(0)
+
+def test_label_components():
+    # . # .
+    # . # #
+    # # . .
+    open_cells = np.array([[1,0,1], [1,0,0], [0,1,1]], dtype=bool)
+    labels, n_components = label_components(open_cells)
+    assert n_components == 3
+    assert labels == [0, -1, 1, 0, -1, -1, -1, 2, 2]
+    assert sorted(reachable_cells(open_cells, 7)) == [7, 8]
+    assert label_components(np.zeros((2,2), dtype=bool)) == ([-1]*4, 0)
+
+def check_spanning_tree(tree, open_cells):
+    # Every open cell must hang off the root through open, adjacent cells.
+    is_open = open_cells.ravel().tolist()
+    for idx in range(len(is_open)):
+        assert bool(tree.in_tree[idx]) == is_open[idx]
+        node, steps = idx, 0
+        while is_open[idx] and node != tree.root:
+            assert tree.parent[node] in tree.neighbour_indices[node]
+            assert is_open[tree.parent[node]]
+            node, steps = tree.parent[node], steps + 1
+            assert steps <= len(is_open)
+
+def test_spanning_tree_certificate():
+    import random
+    rng = random.Random(1)
+    topology = get_topology((5,5))
+    open_cells = np.ones((5,5), dtype=bool)
+    tree = SpanningTree(topology)
+    assert tree.build(open_cells)
+    builds_needed = 0
+    for _ in range(400):
+        idx = rng.randrange(25)
+        row, col = divmod(idx, 5)
+        open_cells[row, col] = not open_cells[row, col]
+        if open_cells[row, col]:
+            tree.reopen(idx)
+        else:
+            tree.close(idx)
+        connected = label_components(open_cells)[1] <= 1
+        if tree.valid:
+            assert connected
+            check_spanning_tree(tree, open_cells)
+        elif connected:
+            builds_needed += 1
+            assert tree.build(open_cells)
+            check_spanning_tree(tree, open_cells)
+        else:
+            assert not tree.build(open_cells)
+    # Most changes keep the certificate.
+    assert builds_needed < 100
@@ -0,0 +1,70 @@
+import random
+
+import pytest
+
+from generate_kurodoko import *
+from grade_kurodoko import grade
+from solve_kurodoko import make_kurodoko_from_file
+
+def test_random_solution_is_valid():
+    rng = random.Random(0)
+    solution = random_solution((8,8), rng)
+    assert np.sum(solution == -1) == int(0.2 * 64)
+    grid = puzzle_from_solution(solution, rng, 0.3)
+    assert len(grid.numbered_cells()) == int(0.3 * np.sum(solution == 1))
+    grid.shades = solution
+    assert grid.is_valid_solution()
+
+def test_clues_from_solution():
+    solution = np.array([[1, 1, 1], [1, -1, 1], [1, 1, 1]], dtype=np.int8)
+    clues = clues_from_solution(solution)
+    assert len(clues) == 8
+    assert (0, 0, 5) in clues and (0, 1, 3) in clues
+
+def test_generated_puzzles_are_unique():
+    for difficulty in ["easy", "medium"]:
+        grid = generate_puzzle(3, (7,7), difficulty)
+        assert grid.has_unique_solution()
+        solved = grid.clone()
+        assert solved.solve(DIFFICULTY_STRATEGIES[difficulty]) == 1
+        assert len(grid.numbered_cells()) < len(solved.white_cells())
+        assert grade(grid.clone()).layer_name in DIFFICULTY_LAYERS[difficulty]
+    easy = generate_puzzle(3, (7,7), "easy")
+    assert np.all(easy.numbers == generate_puzzle(3, (7,7), "easy").numbers)
+
+def test_remove_clues_matches_one_at_a_time_removal():
+    rng = random.Random(1)
+    solution = random_solution((8,8), rng)
+    clues = clues_from_solution(solution)
+    order = list(clues)
+    random.Random(2).shuffle(order)
+    kept = list(order)
+    for clue in order:
+        trial = [other for other in kept if other != clue]
+        if solves_at_difficulty((8,8), trial, "easy"):
+            kept = trial
+    assert remove_clues((8,8), clues, random.Random(2), "easy") == sorted(kept)
+    assert remove_clues((8,8), clues, random.Random(2), "easy", solution) == sorted(kept)
+
+def test_guided_solve_matches_unguided():
+    rng = random.Random(6)
+    solution = random_solution((9,9), rng)
+    # Too few clues to solve, so both stop at the same partial fixpoint.
+    clues = sorted(rng.sample(clues_from_solution(solution), 15))
+    plain = grid_from_state((9,9), clues)
+    guided = grid_from_state((9,9), clues, solution=solution)
+    assert isinstance(guided, GuidedKurodoko) and isinstance(guided.clone(), GuidedKurodoko)
+    assert plain.solve("conjectures") == guided.solve("conjectures") == 0
+    assert np.all(plain.shades == guided.shades)
+
+def test_generate_puzzle_gives_up():
+    for difficulty in ["medium", "hard"]:
+        with pytest.raises(RuntimeError):
+            generate_puzzle(0, (2,2), difficulty, max_attempts=10)
+
+def test_main_writes_puzzle_files(tmpdir):
+    output_dir = str(tmpdir.join("puzzles"))
+    puzzles = main(["2", "--size", "6", "--difficulty", "easy", "--seed", "5", "--output-dir", output_dir, "--workers", "1"])
+    assert len(puzzles) == 2
+    grid = make_kurodoko_from_file(os.path.join(output_dir, "easy_6x6_5.csv"))
+    assert np.all(grid.numbers == puzzles[0].numbers)
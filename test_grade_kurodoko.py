@@ -0,0 +1,29 @@
+from grade_kurodoko import *
+from generate_kurodoko import generate_puzzle
+from solve_kurodoko import Kurodoko
+
+def test_grade_example_grid():
+    grid = make_kurodoko_from_file("example_grid.csv")
+    result = grade(grid)
+    assert result.status == "unique"
+    assert result.layer_name == "branched_conjectures"
+    assert result.uses['deductions'] > 0 and result.uses['branched_conjectures'] >= 1
+    assert result.uses['search'] == 0
+    assert grid.is_valid_solution()
+
+def test_grade_falls_back_to_search():
+    grid = Kurodoko((5,5), set_numbers=[(1,1,5),(3,3,5),(1,3,5),(3,1,5),(2,0,9),(4,2,3)])
+    result = grade(grid)
+    assert result.status == "multiple" and result.layer_name == "search"
+    assert result.uses['search'] > 1
+
+def test_grade_statuses():
+    assert grade(Kurodoko((3,3), set_numbers=[(0,0,3), (1,1,3), (2,2,3)])).status == "multiple"
+    assert grade(Kurodoko((3,3), set_numbers=[(1,1,3), (2,1,2)])).status == "unsolvable"
+    easy = grade(generate_puzzle(3, (7,7), "easy"))
+    assert easy.status == "unique" and easy.layer_name == "deductions"
+    assert easy.sort_key() < grade(make_kurodoko_from_file("example_grid.csv")).sort_key()
+
+def test_grade_puzzle_files():
+    results = main(["example_grid.csv", "--workers", "1"])
+    assert results == [dict(grade(make_kurodoko_from_file("example_grid.csv")).as_dict(), path="example_grid.csv")]
@@ -0,0 +1,67 @@
+import io
+import json
+
+from instrumentation import *
+
+class Counter(object):
+    __slots__ = ['stats', 'value', '_trail_marks']
+
+    def __init__(self):
+        self._trail_marks = []
+
+    def add(self, amount):
+        self.value += amount
+        return self.value
+
+def test_records_and_json_lines():
+    stats = SolverStats()
+    stats.record('rule', 0.5, 2)
+    stats.record('rule', 0.25, 1)
+    stats.record('helper', 0.125)
+    stats.total_seconds = 1.0
+    assert stats.records(puzzle='p') == [
+        {'puzzle': 'p', 'name': 'helper', 'calls': 1, 'seconds': 0.125, 'cells_decided': 0},
+        {'puzzle': 'p', 'name': 'rule', 'calls': 2, 'seconds': 0.75, 'cells_decided': 3},
+    ]
+    textfile = io.StringIO()
+    stats.write_json_lines(textfile, puzzle='p')
+    lines = [json.loads(line) for line in textfile.getvalue().splitlines()]
+    assert len(lines) == 3
+    assert lines[-1] == {'puzzle': 'p', 'name': 'total', 'seconds': 1.0}
+    assert 'rule' in stats.report()
+
+def test_instrumented_class_swaps_in():
+    InstrumentedCounter = make_instrumented_class(Counter, helpers=['add'])
+    counter = Counter()
+    counter.value = 0
+    counter.stats = SolverStats()
+    counter.add(1)
+    assert counter.stats.calls == {}
+    counter.__class__ = InstrumentedCounter
+    assert counter.add(2) == 3
+    assert counter.stats.calls == {'add': 1}
+
+def test_probe_that_raises_is_recorded():
+    InstrumentedCounter = make_instrumented_class(Counter, probes=['add'])
+    counter = Counter()
+    counter.value = None
+    counter.stats = SolverStats()
+    counter.__class__ = InstrumentedCounter
+    try:
+        counter.add(1)
+    except TypeError:
+        pass
+    assert counter.stats.calls == {'add': 1}
+    assert counter.stats.cells_decided == {'add': 0}
+
+def test_probe_under_checkpoint_is_not_credited():
+    InstrumentedCounter = make_instrumented_class(Counter, probes=['add'])
+    counter = Counter()
+    counter.value = 0
+    counter.stats = SolverStats()
+    counter.__class__ = InstrumentedCounter
+    counter.add(1)
+    counter._trail_marks.append(0)
+    counter.add(1)
+    assert counter.stats.calls == {'add': 2}
+    assert counter.stats.cells_decided == {'add': 1}
@@ -31,27 +31,51 @@
 # x clone grid
 
 from solve_kurodoko import *
+import solve_kurodoko
+import pickle
+import pytest
+
+@pytest.fixture(autouse=True, params=sorted(BACKENDS))
+def backend(request, monkeypatch):
+    # Every test below runs once per backend, cross-checking the bitboard
+    # state against the NumPy one.
+    monkeypatch.setattr(solve_kurodoko, 'DEFAULT_BACKEND', request.param)
+    return request.param
+
+# Built per test, after backend has picked the backend they use.
+@pytest.fixture
+def grid_5_5_incomplete(backend):
+    grid = Kurodoko((5,5))
+    grid.shades = np.array([
+        [ 1, 1, 1, 1, 1],
+        [-1, 1, 1,-1, 1],
+        [ 1,-1, 1, 1,-1],
+        [ 1, 1, 1, 0, 0],
+        [ 1, 1,-1, 0, 1]]
+    )
+    return grid
+
+@pytest.fixture
+def grid_3_3_incomplete(backend):
+    grid = Kurodoko((3,3))
+    grid.set_numbers([(0,0,5), (1,2,2)])
+    return grid
 
-grid_5_5_incomplete = Kurodoko((5,5))
-grid_5_5_incomplete.shades = np.array([
-    [ 1, 1, 1, 1, 1],
-    [-1, 1, 1,-1, 1],
-    [ 1,-1, 1, 1,-1],
-    [ 1, 1, 1, 0, 0],
-    [ 1, 1,-1, 0, 1]]
-)
-
-grid_3_3_incomplete = Kurodoko((3,3))
-grid_3_3_incomplete.set_numbers([(0,0,5), (1,2,2)])
-
-grid_3_3_complete = Kurodoko((3,3))
-grid_3_3_complete.numbers = np.array([[5,3,4], [3,0,2], [4,2,0]])
-grid_3_3_complete.shades = np.array([[1,1,1], [1,-1,1], [1,1,-1]])
+@pytest.fixture
+def grid_3_3_complete(backend):
+    grid = Kurodoko((3,3))
+    grid.numbers = np.array([[5,3,4], [3,0,2], [4,2,0]])
+    grid.shades = np.array([[1,1,1], [1,-1,1], [1,1,-1]])
+    return grid
 
 def test_make_grid():
     grid = Kurodoko((5,7))
     assert grid.numbers.shape == (5,7)
 
+def test_shared_grids_use_the_backend(backend, grid_5_5_incomplete, grid_3_3_complete):
+    assert grid_5_5_incomplete.backend == grid_3_3_complete.backend == backend
+    assert isinstance(grid_5_5_incomplete.visibility(), BACKENDS[backend])
+
 def test_grid_initially_blank():
     grid = Kurodoko((5,5))
     assert np.all(grid.numbers == 0)
@@ -82,7 +106,7 @@ def test_count_cells_in_each_direction():
         for j in range(4):
             assert sum(grid.count_cells_in_each_direction(i,j).values()) == 11
 
-def test_count_cells_from_3_2_correct():
+def test_count_cells_from_3_2_correct(grid_5_5_incomplete):
     assert grid_5_5_incomplete.count_visible_cells_in_direction(3,2,'north',1) == 3
     assert grid_5_5_incomplete.count_visible_cells_in_direction(3,2,'south',1) == 0
     assert grid_5_5_incomplete.count_visible_cells_in_direction(3,2,'west',1) == 2
@@ -92,7 +116,7 @@ def test_count_cells_from_3_2_correct():
     assert grid_5_5_incomplete.count_visible_cells_in_direction(3,2,'west',0) == 2
     assert grid_5_5_incomplete.count_visible_cells_in_direction(3,2,'east',0) == 2
 
-def test_count_cells_from_4_3_correct():
+def test_count_cells_from_4_3_correct(grid_5_5_incomplete):
     assert grid_5_5_incomplete.count_visible_cells_in_direction(4,3,'north',1) == 0
     assert grid_5_5_incomplete.count_visible_cells_in_direction(4,3,'south',1) == 0
     assert grid_5_5_incomplete.count_visible_cells_in_direction(4,3,'west',1) == 0
@@ -102,7 +126,7 @@ def test_count_cells_from_4_3_correct():
     assert grid_5_5_incomplete.count_visible_cells_in_direction(4,3,'west',0) == 0
     assert grid_5_5_incomplete.count_visible_cells_in_direction(4,3,'east',0) == 1
 
-def test_count_visible_cells_from():
+def test_count_visible_cells_from(grid_5_5_incomplete):
     assert grid_5_5_incomplete.count_visible_cells_from(2,2,1) == 4
     assert grid_5_5_incomplete.count_visible_cells_from(3,3,1) == 0
     assert grid_5_5_incomplete.count_visible_cells_from(3,3,0) == 6
@@ -127,13 +151,13 @@ def test_get_neighbours():
     """
     assert sorted(grid.get_diagonal_neighbours(2,3)) == sorted([(1,2), (3,2)])
 
-def test_get_open_neighbours():
+def test_get_open_neighbours(grid_5_5_incomplete):
     assert grid_5_5_incomplete.get_open_neighbours(0,0,0) == [(0,1)]
     assert set(grid_5_5_incomplete.get_open_neighbours(2,2,0)) == set([(2,3), (1,2), (3,2)])
     assert set(grid_5_5_incomplete.get_open_neighbours(2,3,0)) == set([(2,2), (3,3)])
     assert grid_5_5_incomplete.get_open_neighbours(2,3,1) == [(2,2)]
 
-def test_collect_contiguous_cells_from():
+def test_collect_contiguous_cells_from(grid_5_5_incomplete):
     grid = Kurodoko((3,3))
     grid.shades = np.ones_like(grid.shades)
     grid.shades[(0,0)] = -1
@@ -148,7 +172,7 @@ def test_collect_contiguous_cells_from():
     assert len(incomplete_grid_cells_strict) == 16
     assert len(incomplete_grid_cells_lax) == 20
 
-def test_get_all_white_cells():
+def test_get_all_white_cells(grid_3_3_incomplete, grid_3_3_complete):
     white_cells = grid_3_3_complete.get_all_white_cells(thresh=1)
     expected_cells = [(0,0), (0,1), (0,2), (1,0), (1,2), (2,0), (2,1)]
     assert sorted(white_cells) == sorted(expected_cells)
@@ -157,7 +181,7 @@ def test_get_all_white_cells():
     white_cells = grid_3_3_incomplete.get_all_white_cells(thresh=0)
     assert sorted(white_cells) == sorted(grid_3_3_incomplete.valid_coords)
 
-def test_grid_for_contiguity():
+def test_grid_for_contiguity(grid_5_5_incomplete, grid_3_3_complete):
     assert not grid_3_3_complete._any_regions_cut_off(1)
     grid = Kurodoko((3,3))
     grid.shades[0,1] = -1
@@ -181,7 +205,7 @@ def test_number_is_valid_at():
     for i in range(3):
         assert not grid.number_is_valid_at(i, i)
 
-def test_black_cells_valid():
+def test_black_cells_valid(grid_5_5_incomplete):
     assert grid_5_5_incomplete.black_cell_is_valid_at(2,1)
     assert not grid_5_5_incomplete.black_cell_is_valid_at(2,2)
     grid = Kurodoko((5,10))
@@ -193,7 +217,7 @@ def test_black_cells_valid():
     assert not grid.black_cell_is_valid_at(4,4)
     assert grid.black_cell_is_valid_at(3,6)
 
-def test_cell_is_valid():
+def test_cell_is_valid(grid_3_3_complete):
     """
     Example grid:
     
@@ -215,7 +239,7 @@ def test_cell_is_valid():
     for coord in grid.valid_coords:
         assert grid.cell_is_valid(*coord) == (cell_contains_an_error[coord]==0)
 
-def test_grid_contains_no_errors():
+def test_grid_contains_no_errors(grid_3_3_complete):
     # Complete example has no errors
     assert grid_3_3_complete.grid_contains_no_errors()
 
@@ -240,11 +264,11 @@ def test_grid_contains_no_errors():
     grid.shades[grid.shades==0] = 1
     assert not grid.grid_contains_no_errors()
 
-def test_deduce_max_spacer():
+def test_deduce_max_spacer(grid_3_3_incomplete):
     assert grid_3_3_incomplete.cell_sees_max_possible(0,0,0)
     assert not grid_3_3_incomplete.cell_sees_max_possible(1,2,0)
 
-def test_get_coords_of_cells_in_direction():
+def test_get_coords_of_cells_in_direction(grid_5_5_incomplete):
     assert grid_5_5_incomplete.coords_of_visible_cells_in_direction(1,2,'north',0) == [(0,2)]
     assert grid_5_5_incomplete.coords_of_visible_cells_in_direction(1,2,'south',0) == [(2,2), (3,2)]
     assert grid_5_5_incomplete.coords_of_visible_cells_in_direction(1,2,'east',0) == []
@@ -260,7 +284,7 @@ def test_deduce_cell_maxes_visible_space():
     grid.deduce_cell_maxes_visible_space(0,0)
     assert grid.shades[1,0] == grid.shades[0,2] == 1
 
-def test_find_nearest_blank_cell_in_direction():
+def test_find_nearest_blank_cell_in_direction(grid_5_5_incomplete):
     assert grid_5_5_incomplete.nearest_blank_cell_in_direction(3,0,'east') == (3,3)
     assert grid_5_5_incomplete.nearest_blank_cell_in_direction(4,4,'north') == (3,4)
     assert grid_5_5_incomplete.nearest_blank_cell_in_direction(1,1,'east') == ()
@@ -537,9 +561,335 @@ def test_load_grid_from_textfile():
     outcome = grid.solve_grid_with_deductions_and_single_conjectures(branched=True)
     assert outcome == 1
 
-def test_save_grid_to_textfile():
+def test_save_grid_to_textfile(tmp_path):
     grid = make_kurodoko_from_file("example_grid.csv")
     outcome = grid.solve_grid_with_deductions_and_single_conjectures(branched=True)
-    make_csv_from_kurodoko(grid, "example_grid_solved.csv")
+    make_csv_from_kurodoko(grid, str(tmp_path / "example_grid_solved.csv"))
+
+# from solve_kurodoko import *
+
+def test_assign_keeps_incremental_state_in_sync():
+    rng = np.random.RandomState(1)
+    grid = Kurodoko((6,7), set_numbers=[(0,0,6), (2,3,9), (5,6,4), (4,1,3)])
+    for _ in range(60):
+        coord = (rng.randint(6), rng.randint(7))
+        grid.assign(coord, rng.randint(-1, 2))
+        reference = grid.clone()
+        reference._rebuild_state()
+        assert np.all(grid.visibility().runs == reference.visibility().runs)
+        assert np.all(grid.visibility().totals == reference.visibility().totals)
+        assert grid._adjacent_black_pairs == reference._adjacent_black_pairs
+        assert grid._black_numbered_cells == reference._black_numbered_cells
+        assert grid._clues_seeing_wrong_number == reference._clues_seeing_wrong_number
+
+def test_direct_writes_mark_state_stale():
+    grid = Kurodoko((4,4), set_numbers=[(0,0,5), (3,3,2)])
+    assert not grid._contains_contradiction()
+    grid.assign((1,1), -1)
+    assert not grid._cache_status.stale
+    grid.shades[1][2] = -1
+    assert grid._cache_status.stale
+    assert grid._any_black_cells_adjoin_each_other()
+    grid.numbers[0,0] = 9
+    assert grid._cache_status.stale
+    assert grid._any_cell_sees_wrong_number()
+    assert type(grid.shades >= 0) is np.ndarray
+
+def test_pickled_grid_tracks_direct_writes():
+    grid = pickle.loads(pickle.dumps(Kurodoko((3,3), set_numbers=[(0,0,3)])))
+    assert not grid._contains_contradiction()
+    grid.shades[1,1] = -1
+    assert grid._cells[4] == -1
+    assert grid.black_cells() == [(1,1)] and grid.count_visible_cells_from(0,0,0) == 4
+
+def test_checkpoint_and_rollback():
+    grid = Kurodoko((4,4), set_numbers=[(1,1,6), (2,3,2)])
+    before = grid.shades.copy()
+    grid.checkpoint()
+    grid.set_shade_black(2,2)
+    grid.checkpoint()
+    grid.assign((1,1), -1)
+    assert grid._contains_contradiction()
+    grid.rollback()
+    assert grid.shades[1,1] == 1 and grid.shades[2,2] == -1
+    assert not grid._contains_contradiction()
+    grid.rollback()
+    assert np.all(grid.shades == before)
+    assert grid.count_visible_cells_from(2,3,0) == 6
+
+def test_probing_leaves_grid_untouched():
+    grid = Kurodoko((4,4), set_numbers=[(1,1,6), (2,3,2)])
+    before = grid.shades.copy()
+    for coord in grid.valid_coords:
+        grid.check_must_not_be_black(*coord)
+        grid.check_must_not_be_white(*coord)
+        if grid.shades[coord] == 0:
+            grid.cell_cannot_be_black(*coord)
+    get_x_y_outcomes(grid, (0,0))
+    assert np.all(grid.shades == before)
+    assert grid._trail == [] and grid._trail_marks == []
+
+def test_compact_board_representation():
+    grid = Kurodoko((5,5), set_numbers=[(0,0,4), (2,1,9)])
+    assert not hasattr(grid, '__dict__')
+    assert grid.shades.dtype == np.int8
+    grid.shades[1,1] = -1
+    assert grid._cells[6] == -1
+    assert grid._contains_contradiction()
+    grid_copy = grid.clone()
+    assert grid_copy._visibility_engine is grid._visibility_engine
+    grid_copy.assign((4,4), -1)
+    assert grid_copy._visibility_engine is not grid._visibility_engine
+    assert grid.shades[4,4] == 0 and grid.count_visible_cells_from(0,4,0) == 8
+    assert grid_copy.count_visible_cells_from(0,4,0) == 7
+    # Setting a number on a clone must not leak into the original.
+    grid_copy.set_number(3,3,2)
+    grid_copy.numbers[0,1] = 3
+    assert grid.numbers[3,3] == 0 and grid_copy.numbers[3,3] == 2
+    assert grid.numbers[0,1] == 0
+    grid.shades[1,1] = 0
+    assert not grid._contains_contradiction() and grid_copy.shades[1,1] == -1
+
+def sweep_with_deductions(grid):
+    # Reference: the full-grid sweep the worklist replaces.
+    iterations = 0
+    state_changed = True
+    while state_changed:
+        before = grid.shades.copy()
+        for coord in grid.valid_coords:
+            if grid.numbers[coord] > 0:
+                grid.deduce_cell_maxes_visible_space(*coord)
+                grid.deduce_number_already_satisfied(*coord)
+            if grid.shades[coord] == 0:
+                grid.deduce_dont_split_grid(*coord)
+        state_changed = not np.all(before == grid.shades)
+        iterations += 1
+    return iterations
+
+def test_worklist_reaches_same_fixpoint_as_sweep():
+    puzzles = [
+        ((4,4), [(1,1,7), (0,3,2), (2,0,4)]),
+        ((5,5), [(0,0,4), (0,4,6), (2,1,9), (2,3,5), (4,0,2)]),
+        ((9,9), [(0,5,9), (1,3,9), (1,7,9), (2,0,9), (2,2,15), (2,4,10),
+            (3,3,6), (3,5,9), (4,2,7), (4,6,3), (5,3,5), (5,5,9),
+            (6,4,6), (6,6,6), (6,8,7), (7,1,3), (7,5,13), (8,3,2)]),
+    ]
+    for grid_size, numbers in puzzles:
+        grid = Kurodoko(grid_size, set_numbers=numbers)
+        reference = grid.clone()
+        iterations = sweep_with_deductions(reference)
+        grid.solve_grid_with_deductions()
+        assert np.all(grid.shades == reference.shades)
+        assert grid.solving_iterations == iterations
+        assert grid.rule_firings < iterations * grid.height * grid.width
+
+def test_search_solves_what_branching_cannot():
+    grid = Kurodoko((5,5), set_numbers=[(1,1,5),(3,3,5),(1,3,5),(3,1,5),(2,0,9),(4,2,3)])
+    assert grid.clone().solve("branched") == 0
+    assert grid.solve("search") == 1
+    assert grid.is_valid_solution()
+    assert grid.search_nodes > 1
 
-# from solve_kurodoko import *
\ No newline at end of file
+def test_search_reports_unsolvable_grid():
+    bad_grid = Kurodoko((3,3), set_numbers=[(1,1,3), (2,1,2)])
+    assert bad_grid.solve("search") == -1
+    # Branching gives up on this one because it has two solutions, but a
+    # search just returns the first.
+    grid = Kurodoko((3,3), set_numbers=[(0,0,3), (1,1,3), (2,2,3)])
+    assert grid.solve("search") == 1
+
+def test_compare_heuristics():
+    grid = make_kurodoko_from_file("example_grid.csv")
+    results = compare_heuristics(grid)
+    assert sorted(results) == sorted(BRANCHING_HEURISTICS)
+    for outcome, nodes, seconds in results.values():
+        assert outcome == 1 and nodes >= 1 and seconds >= 0
+    assert np.all(grid.shades[grid.numbers == 0] == 0)
+
+def test_count_solutions():
+    grid = Kurodoko((3,3), set_numbers=[(0,0,3), (1,1,3), (2,2,3)])
+    count, witnesses = grid.count_solutions()
+    assert count == 2
+    assert not np.all(witnesses[0] == witnesses[1])
+    for witness in witnesses:
+        solved = grid.clone()
+        solved.shades = witness
+        assert solved.is_valid_solution()
+    assert np.all(grid.shades[grid.numbers == 0] == 0)
+    assert grid.count_solutions(limit=1)[0] == 1
+    assert Kurodoko((3,3), set_numbers=[(1,1,3), (2,1,2)]).count_solutions() == (0, [])
+    assert make_kurodoko_from_file("example_grid.csv").has_unique_solution()
+
+def test_state_round_trip():
+    grid = make_kurodoko_from_file("example_grid.csv")
+    grid.set_shade_black(3,0)
+    copy = make_kurodoko_from_state(grid.to_state())
+    assert np.all(copy.shades == grid.shades) and np.all(copy.numbers == grid.numbers)
+    assert copy.backend == grid.backend
+    copy.set_number(6,3,2)
+    assert grid.numbers[6,3] == 0
+
+def test_speculation_frees_executor_after_early_decision():
+    from concurrent.futures import ThreadPoolExecutor
+
+    class RecordingExecutor(ThreadPoolExecutor):
+        def __init__(self):
+            ThreadPoolExecutor.__init__(self, max_workers=2)
+            self.futures = []
+
+        def submit(self, *args):
+            future = ThreadPoolExecutor.submit(self, *args)
+            self.futures.append(future)
+            return future
+
+    grid = make_kurodoko_from_file("example_grid.csv")
+    with RecordingExecutor() as executor:
+        assert grid.solve("branched", executor=executor, lookahead=4) == 1
+        # The first candidate decided a cell, so the rest was dropped.
+        assert grid.reasonings[0] == "make_clear_deduction"
+        assert len(executor.futures) > 2
+        assert all([future.done() for future in executor.futures])
+
+def test_parallel_branching_matches_serial():
+    from concurrent.futures import ProcessPoolExecutor
+    grid = Kurodoko((11,11), set_numbers=[
+        (0,2,9), (0,8,8), (1,8,7),
+        (2,4,12), (2,10,16), (3,0,9), (4,1,10),
+        (5,2,12), (5,4,8), (5,6,11), (5,8,3),
+        (6,9,3), (7,10,3), (8,0,7), (8,6,2),
+        (9,2,7), (10,2,2), (10,8,5)
+    ])
+    serial = grid.clone()
+    serial_outcome = serial.solve("branched")
+    with ProcessPoolExecutor(max_workers=2) as executor:
+        outcome = grid.solve("branched", executor=executor)
+        assert get_x_y_outcomes(serial, (0,0), executor) == get_x_y_outcomes(serial, (0,0))
+        example = make_kurodoko_from_file("example_grid.csv")
+        assert example.solve("branched", executor=executor, lookahead=1) == 1
+    assert outcome == serial_outcome == 1
+    assert np.all(grid.shades == serial.shades)
+    assert grid.reasonings == serial.reasonings
+    assert grid.solving_iterations == serial.solving_iterations
+
+def test_board_hash_is_incremental():
+    grid = make_kurodoko_from_file("example_grid.csv")
+    key = grid.board_key()
+    grid.checkpoint()
+    grid.set_shade_black(3,0)
+    changed_key = grid.board_key()
+    assert changed_key != key
+    grid._rebuild_state()
+    assert grid.board_key() == changed_key
+    grid.rollback()
+    assert grid.board_key() == key
+    other = make_kurodoko_from_file("example_grid.csv")
+    other.set_number(6,3,2)
+    assert other.board_key()[0] != key[0]
+
+def test_transposition_table_gives_same_results():
+    from transposition import TranspositionTable
+    grid = Kurodoko((11,11), set_numbers=[
+        (0,2,9), (0,8,8), (1,8,7),
+        (2,4,12), (2,10,16), (3,0,9), (4,1,10),
+        (5,2,12), (5,4,8), (5,6,11), (5,8,3),
+        (6,9,3), (7,10,3), (8,0,7), (8,6,2),
+        (9,2,7), (10,2,2), (10,8,5)
+    ])
+    plain = grid.clone()
+    grid.transposition_table = TranspositionTable()
+    assert grid.solve("branched") == plain.solve("branched") == 1
+    assert np.all(grid.shades == plain.shades)
+    assert grid.reasonings == plain.reasonings
+    assert grid.solving_iterations == plain.solving_iterations == 11
+    assert grid.transposition_table.hits > 0
+
+    puzzle = make_kurodoko_from_file("example_grid.csv")
+    puzzle.transposition_table = TranspositionTable()
+    assert puzzle.count_solutions()[0] == 1
+    misses = puzzle.transposition_table.misses
+    # A second search only meets boards it has seen before.
+    assert puzzle.count_solutions()[0] == 1
+    assert puzzle.transposition_table.misses == misses
+
+def test_deduce_clue_splits():
+    grid = Kurodoko((3,3), set_numbers=[(0,0,4)])
+    grid.deduce_cell_maxes_visible_space(0,0)
+    grid.deduce_number_already_satisfied(0,0)
+    assert len(grid.white_cells()) == 1
+    # Seeing 3 cells out of 2 south and 2 east needs at least 1 each way.
+    grid.deduce_clue_splits(0,0)
+    assert sorted(grid.white_cells()) == [(0,0), (0,1), (1,0)]
+    grid.assign((0,2), -1)
+    grid.deduce_clue_splits(0,0)
+    assert grid.shades[2,0] == 1
+    assert grid.ray_count_masks(0,0) == (1, 0b100, 0b10, 1)
+
+def test_clue_splits_cut_search():
+    grid = make_kurodoko_from_file("example_grid.csv")
+    assert grid.solve("search") == 1
+    assert grid.search_nodes == 1
+
+def test_profiled_solve():
+    grid = make_kurodoko_from_file("example_grid.csv")
+    plain = grid.clone()
+    blank_cells = len(grid.blank_cells())
+    outcome, stats = grid.solve("branched", profile=True)
+    assert outcome == plain.solve("branched") == 1
+    assert type(grid) is Kurodoko and grid.stats is stats
+    assert np.all(grid.shades == plain.shades)
+    assert stats.calls['check_must_not_be_black'] > 0
+    assert stats.calls['_contains_contradiction'] > 0
+    assert stats.cells_decided['deduce_dont_split_grid'] > 0
+    assert stats.total_seconds > 0
+    # Cells set inside probes are rolled back, so they are not credited:
+    # the direct rules and the probes together decided at most every cell
+    # the solve did.
+    direct_rules = ['deduce_cell_maxes_visible_space', 'deduce_number_already_satisfied', 'deduce_dont_split_grid']
+    credited = sum([stats.cells_decided.get(name, 0) for name in direct_rules + list(PROFILED_METHODS['probes'])])
+    assert credited <= blank_cells
+
+def test_connectivity_certificate_survives_probing():
+    grid = make_kurodoko_from_file("example_grid.csv")
+    assert not grid._any_regions_cut_off(0)
+    builds = grid._spanning_tree.builds
+    candidates = grid.get_cant_be_black_candidates()
+    for coord in candidates:
+        grid.check_must_not_be_black(*coord)
+    assert grid._spanning_tree.builds - builds < len(candidates) // 2
+    grid.assign((0,1), -1)
+    grid.assign((1,0), -1)
+    assert grid._any_regions_cut_off(0) and grid._contains_contradiction()
+    grid.assign((1,0), 0)
+    assert not grid._any_regions_cut_off(0)
+
+def test_clue_encoding():
+    grid = make_kurodoko_from_file("example_grid.csv")
+    assert make_line_from_kurodoko(grid) == "7x7 2e7a3g4g5g6g7a11e8"
+    numbers = np.zeros((4,10), dtype=np.int16)
+    numbers[0,0], numbers[0,1], numbers[3,9] = 12, 3, 5
+    assert encode_clues(numbers) == "12.3zk5"
+    assert decode_clues("12.3zk5", (4,10)) == [(0,0,12), (0,1,3), (3,9,5)]
+    for text in ["zz", "A", "3\u00e91"]:
+        with pytest.raises(ValueError):
+            decode_clues(text, (4,4))
+
+def test_line_without_clues():
+    grid = Kurodoko((3,3))
+    grid.shades = np.array([[-1, 1, -1], [1, 1, 1], [-1, 1, -1]], dtype=np.int8)
+    line = make_line_from_kurodoko(grid, include_shades=True)
+    assert line == "3x3 . xoxoooxox"
+    again = make_kurodoko_from_line(line)
+    assert np.all(again.numbers == 0) and np.all(again.shades == grid.shades)
+
+def test_streaming_round_trip(tmpdir):
+    filepath = str(tmpdir.join("puzzles.txt"))
+    solved = make_kurodoko_from_file("example_grid.csv")
+    solved.solve("branched")
+    grids = (grid for grid in [make_kurodoko_from_file("example_grid.csv"), solved])
+    assert write_kurodokos_to_file(grids, filepath) == 2
+    reader = iter_kurodokos_from_file(filepath)
+    first = next(reader)
+    assert np.all(first.numbers == solved.numbers) and len(first.blank_cells()) > 0
+    second = next(reader)
+    assert np.all(second.shades == solved.shades) and second.is_valid_solution()
+    assert list(reader) == []
@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+from kurodoko_archive import *
+from solve_kurodoko import make_line_from_kurodoko
+
+def example_grids():
+    unsolved = make_kurodoko_from_file("example_grid.csv")
+    solved = unsolved.clone()
+    solved.solve("search")
+    return [unsolved, solved]
+
+def test_pack_shades_round_trip():
+    rng = np.random.RandomState(0)
+    for n_cells in [1, 4, 7, 49]:
+        shades = rng.randint(-1, 2, size=n_cells).astype(np.int8)
+        packed = pack_shades(shades)
+        assert len(packed) == (n_cells + 3) // 4
+        assert np.array_equal(unpack_shades(packed, n_cells), shades)
+
+def test_archive_round_trip(tmp_path):
+    filepath = str(tmp_path / "puzzles.kdb")
+    grids = example_grids()
+    assert write_archive(iter(grids), filepath) == 2
+    archive = KurodokoArchive(filepath)
+    assert len(archive) == 2
+    assert archive.grid_size == (7,7)
+    # 49 int8 clues and 13 bytes of packed shades.
+    assert archive.record_size == 62
+    for grid, loaded in zip(grids, archive):
+        assert np.array_equal(loaded.numbers, grid.numbers)
+        assert np.array_equal(loaded.shades, grid.shades)
+    assert archive[-1].is_valid_solution()
+    assert np.array_equal(archive.numbers(0), grids[0].numbers)
+    with pytest.raises(IndexError):
+        archive[2]
+
+def test_archive_errors(tmp_path):
+    filepath = str(tmp_path / "empty.kdb")
+    assert write_archive([], filepath, grid_size=(7,7)) == 0
+    assert len(KurodokoArchive(filepath)) == 0
+    with pytest.raises(ValueError):
+        write_archive([], filepath)
+    with pytest.raises(ValueError):
+        write_archive([Kurodoko((7,7)), Kurodoko((5,5))], filepath)
+    with open(filepath, "w") as textfile:
+        textfile.write("7x7 2e7a3g4g5g6g7a11e8\n")
+    with pytest.raises(ValueError):
+        KurodokoArchive(filepath)
+
+def test_line_conversions(tmp_path):
+    line_path = str(tmp_path / "puzzles.txt")
+    archive_path = str(tmp_path / "puzzles.kdb")
+    write_kurodokos_to_file(example_grids(), line_path)
+    assert make_archive_from_lines(line_path, archive_path) == 2
+    round_trip_path = str(tmp_path / "round_trip.txt")
+    assert make_lines_from_archive(archive_path, round_trip_path) == 2
+    with open(line_path) as before, open(round_trip_path) as after:
+        assert before.read() == after.read()
+
+def test_main(tmp_path, capsys):
+    archive_path = str(tmp_path / "puzzles.kdb")
+    assert main(["pack", "example_grid.csv", archive_path]) == 1
+    assert main(["info", archive_path]) == 1
+    assert "1 puzzles of 7x7" in capsys.readouterr().out
+    assert make_line_from_kurodoko(make_kurodoko_from_archive(archive_path, 0)) == "7x7 2e7a3g4g5g6g7a11e8"
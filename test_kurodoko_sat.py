@@ -0,0 +1,96 @@
+import io
+import itertools
+
+import pytest
+
+from kurodoko_sat import *
+from solve_kurodoko import Kurodoko, make_kurodoko_from_file
+
+def satisfies(model, clauses):
+    return all([any([model[abs(literal)] == (literal > 0) for literal in clause]) for clause in clauses])
+
+def test_cdcl_solver():
+    solver = CDCLSolver(3)
+    clauses = [[1, 2], [-1, 3], [-2, 3], [-3, 1]]
+    for clause in clauses:
+        solver.add_clause(clause)
+    model = solver.solve()
+    assert satisfies(model, clauses)
+    solver.add_clause([-1])
+    assert solver.solve() is None
+
+def test_cdcl_solver_pigeonhole():
+    # Three pigeons, two holes: variable 2 * p + h + 1 puts pigeon p in hole h.
+    solver = CDCLSolver()
+    for p in range(3):
+        solver.add_clause([2 * p + 1, 2 * p + 2])
+    for h in range(2):
+        for p, q in itertools.combinations(range(3), 2):
+            solver.add_clause([-(2 * p + h + 1), -(2 * q + h + 1)])
+    assert solver.solve() is None
+
+def test_luby():
+    assert [luby(i) for i in range(15)] == [1, 1, 2, 1, 1, 2, 4, 1, 1, 2, 1, 1, 2, 4, 8]
+
+def test_cdcl_solver_restarts_and_reduces():
+    # Six pigeons, five holes needs many conflicts, so with these limits
+    # the solver restarts and deletes learnt clauses along the way.
+    solver = CDCLSolver(restart_unit=2, max_learnts=10)
+    for p in range(6):
+        solver.add_clause([5 * p + h + 1 for h in range(5)])
+    for h in range(5):
+        for p, q in itertools.combinations(range(6), 2):
+            solver.add_clause([-(5 * p + h + 1), -(5 * q + h + 1)])
+    assert solver.solve() is None
+    assert solver.restarts > 0 and solver.max_learnts > 10
+
+def test_add_exactly():
+    grid = Kurodoko((1,1))
+    for n, k in [(4, 0), (4, 2), (3, 3)]:
+        for values in itertools.product([False, True], repeat=n):
+            cnf = KurodokoCNF(grid)
+            literals = [cnf.new_var() for _ in range(n)]
+            cnf.add_exactly(literals, k)
+            solver = CDCLSolver(cnf.n_vars)
+            for clause in cnf.clauses:
+                solver.add_clause(clause)
+            for literal, value in zip(literals, values):
+                solver.add_clause([literal if value else -literal])
+            assert (solver.solve() is not None) == (sum(values) == k)
+
+def test_cut_clauses():
+    grid = Kurodoko((3,3))
+    cnf = KurodokoCNF(grid)
+    shades = np.array([[1, -1, 1], [-1, 1, 1], [1, 1, 1]], dtype=np.int8)
+    assert cnf.cut_clauses(shades) == [[1, 3, -2, -4]]
+    shades[0, 1] = 1
+    assert cnf.cut_clauses(shades) == []
+
+def test_solve_with_sat():
+    grid = make_kurodoko_from_file("example_grid.csv")
+    reference = grid.clone()
+    assert reference.solve("search") == 1
+    assert grid.solve("sat") == 1
+    assert np.all(grid.shades == reference.shades)
+    assert Kurodoko((3,3), set_numbers=[(1,1,3), (2,1,2)]).solve("sat") == -1
+
+def test_solve_with_sat_keeps_shaded_cells():
+    grid = Kurodoko((3,3), set_numbers=[(0,0,3), (1,1,3), (2,2,3)])
+    grid.set_shade_black(0,1)
+    assert solve_with_sat(grid) == 1
+    assert grid.is_valid_solution() and grid.shades[0,1] == -1
+
+def test_dimacs_round_trip():
+    grid = make_kurodoko_from_file("example_grid.csv")
+    textfile = io.StringIO()
+    KurodokoCNF(grid).write_dimacs(textfile)
+    lines = textfile.getvalue().splitlines()
+    n_vars, n_clauses = [int(field) for field in lines[0].split()[2:]]
+    assert n_clauses == len(lines) - 1 and n_vars > grid.height * grid.width
+    assert parse_model("s SATISFIABLE\nv 1 -2 3\nv 0\n", 3) == [False, True, False, True]
+    assert parse_model("s UNSATISFIABLE\n", 3) is None
+    for output in ["s UNKNOWN\n", "", "v 1 -2 3\nv 0\n"]:
+        with pytest.raises(RuntimeError):
+            parse_model(output, 3)
+    with pytest.raises(RuntimeError):
+        solve_with_sat(grid, command=["false"])
@@ -0,0 +1,24 @@
+from topology import *
+from solve_kurodoko import Kurodoko
+
+def test_topology_is_shared_per_grid_size():
+    grid = Kurodoko((4,6))
+    assert Kurodoko((4,6)).topology is grid.topology
+    assert grid.clone().topology is grid.topology
+    assert Kurodoko((6,4)).topology is not grid.topology
+
+def test_neighbour_tables():
+    topology = get_topology((3,4))
+    assert sorted(topology.neighbours[topology.index(1,1)]) == [(0,1), (1,0), (1,2), (2,1)]
+    assert sorted(topology.neighbour_indices[0]) == [1, 4]
+    assert sorted(topology.diagonal_neighbours[topology.index(0,3)]) == [(1,2)]
+
+def test_rays():
+    topology = get_topology((3,4))
+    idx = topology.index(1,1)
+    assert topology.rays['north'][idx] == [(0,1)]
+    assert topology.rays['south'][idx] == [(2,1)]
+    assert topology.rays['east'][idx] == [(1,2), (1,3)]
+    assert topology.rays['west'][idx] == [(1,0)]
+    assert topology.ray_indices['east'][idx] == [6, 7]
+    assert topology.rays['west'][topology.index(2,0)] == []
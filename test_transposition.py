@@ -0,0 +1,21 @@
+from transposition import *
+
+def test_lookup_checks_full_state():
+    table = TranspositionTable()
+    table.store((1, 2), b'abc', 'result')
+    assert table.lookup((1, 2), b'abc') == 'result'
+    assert table.lookup((1, 2), b'abd') is None
+    assert table.lookup((1, 3), b'abc') is None
+    assert (table.hits, table.misses) == (1, 2)
+    assert table.hit_rate() == 1 / 3
+
+def test_least_recently_used_entry_is_evicted():
+    table = TranspositionTable(maxsize=2)
+    table.store('a', b'', 1)
+    table.store('b', b'', 2)
+    table.lookup('a', b'')
+    table.store('c', b'', 3)
+    assert len(table) == 2
+    assert table.lookup('b', b'') is None
+    assert table.lookup('a', b'') == 1
+    assert table.lookup('c', b'') == 3
@@ -0,0 +1,41 @@
+from visibility import *
+from solve_kurodoko import Kurodoko
+
+def scalar_count(shades, row, col, direction, thresh):
+    # The original per-cell walk, kept here as the reference implementation.
+    if shades[row,col] < thresh:
+        return 0
+    steps = {'north':(-1,0), 'south':(1,0), 'east':(0,1), 'west':(0,-1)}
+    d_row, d_col = steps[direction]
+    n_visible = 0
+    row, col = row + d_row, col + d_col
+    while 0 <= row < shades.shape[0] and 0 <= col < shades.shape[1] and shades[row,col] >= thresh:
+        n_visible += 1
+        row, col = row + d_row, col + d_col
+    return n_visible
+
+def test_runs_before_and_after():
+    open_cells = np.array([True, True, False, True, True, True])
+    assert list(runs_before(open_cells, 0)) == [0, 1, 2, 0, 1, 2]
+    assert list(runs_after(open_cells, 0)) == [1, 0, 3, 2, 1, 0]
+
+def test_visible_run_lengths_match_scalar_walk():
+    rng = np.random.RandomState(0)
+    for shape in [(1,1), (1,6), (5,1), (5,5), (7,11)]:
+        for _ in range(20):
+            shades = rng.randint(-1, 2, size=shape)
+            for thresh in [0, 1]:
+                runs = visible_run_lengths(shades, thresh)
+                for d, direction in enumerate(DIRECTIONS):
+                    for row in range(shape[0]):
+                        for col in range(shape[1]):
+                            assert runs[d,row,col] == scalar_count(shades, row, col, direction, thresh)
+
+def test_engine_follows_shade_changes():
+    grid = Kurodoko((3,3))
+    assert grid.count_visible_cells_from(1,1,0) == 4
+    grid.shades[0,1] = -1
+    assert grid.count_visible_cells_from(1,1,0) == 3
+    assert grid.count_visible_cells_from(1,1,1) == 0
+    grid.shades = np.ones((3,3), dtype=int)
+    assert grid.count_visible_cells_in_direction(1,1,'south',1) == 1
@@ -0,0 +1,88 @@
+"""
+Precomputed cell geometry for a given grid size.
+
+Everything here depends only on (height, width), so a single Topology is
+built per grid size and shared by every Kurodoko of that size, including
+clones. Cells are addressed either as (row, col) or by their flat index
+row * width + col.
+"""
+import random
+from functools import lru_cache
+
+from visibility import DIRECTIONS
+
+STEPS = {'north': (-1, 0), 'south': (1, 0), 'east': (0, 1), 'west': (0, -1)}
+
+def grid_neighbours(idx, height, width):
+    row, col = divmod(idx, width)
+    neighbours = []
+    if row > 0:
+        neighbours.append(idx - width)
+    if row < height - 1:
+        neighbours.append(idx + width)
+    if col > 0:
+        neighbours.append(idx - 1)
+    if col < width - 1:
+        neighbours.append(idx + 1)
+    return neighbours
+
+class Topology(object):
+    """
+    For every cell, holds:
+    - neighbours: orthogonal neighbours as (row, col)
+    - neighbour_indices: the same as flat indices
+    - diagonal_neighbours: diagonal neighbours as (row, col)
+    - rays[direction]: every cell from the nearest to the grid edge in
+      that direction, as (row, col)
+    - ray_indices[direction]: the same as flat indices
+    - zobrist_keys: three random 64-bit keys per cell, one per shade
+      (indexed by shade + 1), for incremental board hashing
+    All tables are lists indexed by flat index, and are shared, so callers
+    must treat them as read-only.
+    """
+
+    def __init__(self, grid_size):
+        self.grid_size = tuple(grid_size)
+        self.height, self.width = self.grid_size
+        self.n_cells = self.height * self.width
+        self.valid_coords = [(i,j) for i in range(self.height) for j in range(self.width)]
+        valid_set = set(self.valid_coords)
+        self.neighbours = []
+        self.diagonal_neighbours = []
+        for row, col in self.valid_coords:
+            neighbours = [(row-1,col), (row+1,col), (row,col-1), (row,col+1)]
+            self.neighbours.append(list(set.intersection(set(neighbours), valid_set)))
+            diagonals = [(row-1,col-1), (row+1,col-1), (row-1,col+1), (row+1,col+1)]
+            self.diagonal_neighbours.append(list(set.intersection(set(diagonals), valid_set)))
+        self.neighbour_indices = [grid_neighbours(idx, self.height, self.width) for idx in range(self.n_cells)]
+        self.rays = {}
+        self.ray_indices = {}
+        for direction in DIRECTIONS:
+            d_row, d_col = STEPS[direction]
+            self.rays[direction] = []
+            for row, col in self.valid_coords:
+                ray = []
+                row_i, col_i = row + d_row, col + d_col
+                while 0 <= row_i < self.height and 0 <= col_i < self.width:
+                    ray.append((row_i, col_i))
+                    row_i, col_i = row_i + d_row, col_i + d_col
+                self.rays[direction].append(ray)
+            self.ray_indices[direction] = [
+                [r * self.width + c for r, c in ray] for ray in self.rays[direction]
+            ]
+        rng = random.Random(repr(self.grid_size))
+        self.zobrist_keys = [[rng.getrandbits(64) for _ in range(3)] for _ in range(self.n_cells)]
+
+    def index(self, row, col):
+        return row * self.width + col
+
+    def __deepcopy__(self, memo):
+        # Immutable once built, so copies of a grid keep sharing it.
+        return self
+
+@lru_cache(maxsize=None)
+def _cached_topology(grid_size):
+    return Topology(grid_size)
+
+def get_topology(grid_size):
+    return _cached_topology(tuple(grid_size))
@@ -0,0 +1,44 @@
+"""
+Transposition table for memoizing propagation results.
+
+Boards are keyed by (puzzle id, Zobrist hash of the shades); see
+Kurodoko.board_key(). The full starting shades are stored alongside each
+entry, so a hash collision can never return a wrong result.
+"""
+from collections import OrderedDict
+
+class TranspositionTable(object):
+    """
+    Bounded mapping from board keys to solver results, evicting the least
+    recently used entry once maxsize is reached. hits and misses count
+    lookups, to help size the table for a workload.
+    """
+
+    def __init__(self, maxsize=100000):
+        assert maxsize > 0
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def lookup(self, key, state):
+        entry = self.entries.get(key)
+        if entry is None or entry[0] != state:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def store(self, key, state, value):
+        self.entries[key] = (state, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
@@ -0,0 +1,139 @@
+"""
+Run-length tables behind the visibility queries of a Kurodoko grid.
+
+For every cell and every direction we store how many consecutive cells a
+viewer standing in that cell can see. Everything is computed with a few
+cumulative NumPy operations over the whole grid instead of walking the
+shades one cell at a time.
+"""
+import numpy as np
+
+DIRECTIONS = ['north', 'south', 'east', 'west']
+
+def runs_before(open_cells, axis):
+    """
+    For every cell, counts the consecutive open cells immediately before it
+    along axis (i.e., towards index 0). The cell itself is not counted.
+    """
+    open_cells = np.moveaxis(open_cells, axis, -1)
+    idx = np.arange(open_cells.shape[-1])
+    # Index of the most recent closed cell at or before each position.
+    last_closed = np.maximum.accumulate(np.where(open_cells, -1, idx), axis=-1)
+    inclusive = idx - last_closed
+    before = np.zeros_like(inclusive)
+    before[..., 1:] = inclusive[..., :-1]
+    return np.moveaxis(before, -1, axis)
+
+def runs_after(open_cells, axis):
+    """
+    Like runs_before, but counting towards the end of the axis.
+    """
+    flipped = np.flip(open_cells, axis)
+    return np.flip(runs_before(flipped, axis), axis)
+
+def visible_run_lengths(shades, thresh):
+    """
+    Returns an array of shape (4, height, width) with the number of cells
+    visible from each cell in each of DIRECTIONS.
+
+    If thresh is 1, only white cells are visible; if thresh is 0, white and
+    blank cells are visible. A cell whose own shade is below thresh sees
+    nothing, exactly as in Kurodoko.count_visible_cells_in_direction.
+    """
+    assert thresh in [0, 1]
+    open_cells = shades >= thresh
+    runs = np.stack([
+        runs_before(open_cells, 0),
+        runs_after(open_cells, 0),
+        runs_after(open_cells, 1),
+        runs_before(open_cells, 1),
+    ])
+    runs[:, ~open_cells] = 0
+    return runs
+
+class VisibilityEngine(object):
+    """
+    Holds the run lengths for both thresholds, and their totals per cell.
+
+    runs[thresh, d, row, col] is the number of cells visible from (row, col)
+    in direction DIRECTIONS[d]; totals[thresh, row, col] sums over directions.
+    """
+
+    def __init__(self, shades):
+        self.rebuild(shades)
+
+    def rebuild(self, shades):
+        runs = np.stack([visible_run_lengths(shades, 0), visible_run_lengths(shades, 1)])
+        self.runs = runs.astype(np.int16)
+        self.totals = self.runs.sum(axis=1, dtype=np.int16)
+
+    def copy(self):
+        other = VisibilityEngine.__new__(VisibilityEngine)
+        other.runs = self.runs.copy()
+        other.totals = self.totals.copy()
+        return other
+
+    def black_neighbours(self, shades, row, col):
+        """
+        Counts the black cells orthogonally adjacent to (row, col).
+        """
+        height, width = shades.shape
+        neighbours = [(row-1, col), (row+1, col), (row, col-1), (row, col+1)]
+        return sum([1 for i, j in neighbours if 0 <= i < height and 0 <= j < width and shades[i, j] == -1])
+
+    def adjacent_black_pairs(self, shades):
+        black = shades == -1
+        return int(np.sum(black[1:, :] & black[:-1, :]) + np.sum(black[:, 1:] & black[:, :-1]))
+
+    def count(self, row, col, direction, thresh):
+        return int(self.runs[thresh, DIRECTIONS.index(direction), row, col])
+
+    def total(self, row, col, thresh):
+        return int(self.totals[thresh, row, col])
+
+    def update(self, shades, row, col, old_shade=None):
+        """
+        Refreshes the tables after the cell at (row, col) changed shade.
+
+        Only the horizontal runs of its row and the vertical runs of its
+        column can be affected, so only those are recomputed. If old_shade
+        is given, so are only the thresholds the cell crossed: a blank cell
+        turning white leaves the runs of open cells as they were, and one
+        turning black the runs of white cells.
+        """
+        row_shades = shades[row, :].tolist()
+        col_shades = shades[:, col].tolist()
+        shade = row_shades[col]
+        for thresh in [0, 1]:
+            if old_shade is not None and (old_shade >= thresh) == (shade >= thresh):
+                continue
+            self.runs[thresh, 3, row, :], self.runs[thresh, 2, row, :] = line_runs(row_shades, thresh)
+            self.runs[thresh, 0, :, col], self.runs[thresh, 1, :, col] = line_runs(col_shades, thresh)
+            self.totals[thresh, row, :] = self.runs[thresh, :, row, :].sum(axis=0)
+            self.totals[thresh, :, col] = self.runs[thresh, :, :, col].sum(axis=0)
+
+def line_runs(line, thresh):
+    """
+    Visible run lengths along a single row or column, given as a list of
+    shades. Returns two lists: cells visible towards the start of the line,
+    and towards the end. A single line is short enough that a plain loop
+    beats the overhead of the NumPy version.
+    """
+    n = len(line)
+    before = [0] * n
+    after = [0] * n
+    run = 0
+    for i in range(n):
+        if line[i] >= thresh:
+            before[i] = run
+            run += 1
+        else:
+            run = 0
+    run = 0
+    for i in range(n - 1, -1, -1):
+        if line[i] >= thresh:
+            after[i] = run
+            run += 1
+        else:
+            run = 0
+    return before, after